@@ -0,0 +1,36 @@
+"""
+Cache backends that report their time in the Server-Timing 'cache' metric.
+
+Configure them in CACHES in place of the backend they wrap:
+
+    'BACKEND': 'airbnb.cache_backends.TimedRedisCache'
+"""
+
+from functools import wraps
+
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.cache import RedisCache
+
+from .timing import timed
+
+TIMED_OPERATIONS = (
+    'get', 'get_many', 'set', 'set_many', 'add', 'delete', 'delete_many',
+    'incr', 'decr', 'has_key', 'touch',
+)
+
+
+def timed_cache_backend(backend_class):
+    """Subclass backend_class so each cache operation is timed as 'cache'"""
+    def wrap(operation):
+        @wraps(operation)
+        def method(self, *args, **kwargs):
+            with timed('cache'):
+                return operation(self, *args, **kwargs)
+        return method
+
+    methods = {name: wrap(getattr(backend_class, name)) for name in TIMED_OPERATIONS}
+    return type(f'Timed{backend_class.__name__}', (backend_class,), methods)
+
+
+TimedRedisCache = timed_cache_backend(RedisCache)
+TimedLocMemCache = timed_cache_backend(LocMemCache)
@@ -1,5 +1,8 @@
 import os
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_init, worker_ready
+
+from . import metrics
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airbnb.settings')
 
@@ -9,6 +12,11 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
 
+task_prerun.connect(metrics.celery_task_prerun)
+task_postrun.connect(metrics.celery_task_postrun)
+worker_init.connect(metrics.celery_worker_init)
+worker_ready.connect(metrics.celery_worker_ready)
+
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
@@ -0,0 +1,5 @@
+"""
+Database backends. Configure them with ENGINE in DATABASES:
+
+    'ENGINE': 'airbnb.db_backends.pooled_postgresql'
+"""
@@ -0,0 +1,154 @@
+"""
+PostgreSQL backend that takes its connections from a per-process pool.
+
+Django keeps one connection per thread. With threaded (gthread) or async
+workers that is one connection per thread per process, opened and closed
+as CONN_MAX_AGE allows. This backend instead checks a connection out of a
+pool shared by the process's threads when Django connects, and puts it
+back when Django closes it, so connections are reused across requests and
+threads and their number per process is bounded.
+
+    'ENGINE': 'airbnb.db_backends.pooled_postgresql',
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'pool': {'max_size': 10, 'timeout': 5}},
+
+With CONN_MAX_AGE = 0 each request holds a connection only while it runs.
+The pool pings an idle connection with SELECT 1 when handing it out and
+replaces it if the server has dropped it (restart, idle timeout), so a
+stale connection never reaches a query.
+"""
+
+import os
+import threading
+import time
+
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgreSQLDatabaseWrapper
+from django.db.utils import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+from airbnb.metrics import DB_CONNECTIONS_OPENED, DB_POOL_CHECKOUTS, DB_POOL_CONNECTIONS, DB_POOL_WAIT
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections shared by the threads of a process.
+
+    At most max_size connections exist at once; acquire() waits up to
+    timeout seconds for one to be released before raising
+    OperationalError. Idle connections are validated before reuse.
+    Released connections are rolled back if a transaction was left open
+    and discarded if they are broken.
+    """
+
+    def __init__(self, alias, max_size=10, timeout=5):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = []
+        self._in_use = 0
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+    def acquire(self, connect):
+        """A pooled connection, or a new one from connect() if none is idle"""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            DB_POOL_CHECKOUTS.labels(self.alias, 'timeout').inc()
+            raise OperationalError(
+                f"No connection available in the '{self.alias}' pool within {self.timeout}s "
+                f"(max_size={self.max_size})"
+            )
+        DB_POOL_WAIT.labels(self.alias).observe(time.perf_counter() - started)
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None and not self.is_usable(conn):
+            conn.close()
+        try:
+            if conn is None or conn.closed:
+                conn = connect()
+                DB_CONNECTIONS_OPENED.labels(self.alias).inc()
+                DB_POOL_CHECKOUTS.labels(self.alias, 'new').inc()
+            else:
+                DB_POOL_CHECKOUTS.labels(self.alias, 'reused').inc()
+        except Exception:
+            self._slots.release()
+            self._report()
+            raise
+        with self._lock:
+            self._in_use += 1
+        self._report()
+        return conn
+
+    @staticmethod
+    def is_usable(conn):
+        """Ping an idle connection; False if the server has dropped it"""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            return False
+        return True
+
+    def release(self, conn):
+        """Return a connection to the pool, resetting or dropping it as needed"""
+        try:
+            if not conn.closed:
+                transaction_status = conn.info.transaction_status
+                if transaction_status == TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif transaction_status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+        except Exception:
+            conn.close()
+        with self._lock:
+            self._in_use -= 1
+            if not conn.closed:
+                self._idle.append(conn)
+        self._slots.release()
+        self._report()
+
+    def _report(self):
+        DB_POOL_CONNECTIONS.labels(self.alias, 'in_use').set(self._in_use)
+        DB_POOL_CONNECTIONS.labels(self.alias, 'idle').set(len(self._idle))
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """The current process's pool for alias; pools are not shared across forks"""
+    pool = _pools.get(alias)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[alias] = ConnectionPool(alias, **options)
+    return pool
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    pooled = True
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict['OPTIONS'].get('pool', {}))
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,222 @@
+"""
+Read-replica routing.
+
+Replicas are the DATABASES aliases listed in REPLICA_DATABASES. Reads go to
+one only inside a replica-read scope: the safe-method requests of views
+using ReplicaReadMixin, and replica_reads() blocks. Everything else,
+including every write and any read inside a transaction, uses the primary.
+
+Each scope takes the next usable replica in turn and keeps it for all of
+its queries. A replica is usable while its replication lag, measured by
+the health prober (see airbnb.health_checks), is known, recent and no more
+than REPLICA_MAX_LAG seconds; with none usable, reads stay on the primary.
+
+After a successful write ReadYourWritesMiddleware pins the client to the
+primary for REPLICA_PIN_SECONDS, through a cookie and, for signed-in
+users, a cache marker, so they always read their own changes.
+"""
+
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import DB_READ_ROUTING, DB_REPLICA_LAG
+
+# Alias the current scope reads from; None means the primary.
+current_replica = ContextVar('current_replica', default=None)
+
+PIN_COOKIE = 'primary_pin'
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def measure_lag(connection):
+    """Seconds the database behind connection is behind the primary"""
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.execute('SELECT 1')
+            return 0.0
+        # An idle primary writes no WAL, so equal receive/replay positions
+        # mean caught up however old the last replayed transaction is.
+        cursor.execute(REPLICA_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+class ReplicaSet:
+    """The configured replicas with their last measured lag, chosen round-robin"""
+
+    def __init__(self):
+        self._lag = {}
+        self._turn = itertools.count()
+
+    @property
+    def aliases(self):
+        return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+    def record_lag(self, alias, lag):
+        self._lag[alias] = (lag, time.monotonic())
+        if lag is not None:
+            DB_REPLICA_LAG.labels(alias).set(lag)
+
+    def usable(self, alias):
+        from .health_checks import health_prober
+
+        lag, measured_at = self._lag.get(alias, (None, 0.0))
+        if lag is None or time.monotonic() - measured_at > health_prober.stale_after:
+            return False
+        return lag <= getattr(settings, 'REPLICA_MAX_LAG', 2)
+
+    def choose(self):
+        """Next usable replica alias, or None to read from the primary"""
+        aliases = self.aliases
+        if not aliases:
+            return None
+        from .health_checks import health_prober
+        health_prober.start()
+
+        turn = next(self._turn)
+        for offset in range(len(aliases)):
+            alias = aliases[(turn + offset) % len(aliases)]
+            if self.usable(alias):
+                return alias
+        return None
+
+    def measure(self):
+        """{alias: lag in seconds, or None if unreachable}; run by the health prober"""
+        lags = {}
+        for alias in self.aliases:
+            connection = connections[alias]
+            try:
+                lags[alias] = round(measure_lag(connection), 3)
+            except Exception:
+                lags[alias] = None
+            finally:
+                # Runs in a prober thread: don't leave its connection open.
+                connection.close()
+            self.record_lag(alias, lags[alias])
+        return lags
+
+
+replica_set = ReplicaSet()
+
+
+@contextmanager
+def replica_reads():
+    """Send the block's reads to a replica, if one is usable"""
+    alias = replica_set.choose()
+    DB_READ_ROUTING.labels(alias or DEFAULT_DB_ALIAS).inc()
+    token = current_replica.set(alias)
+    try:
+        yield alias
+    finally:
+        current_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Database router for REPLICA_DATABASES; see the module docstring"""
+
+    def db_for_read(self, model, **hints):
+        alias = current_replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def pin_key(user_id):
+    return f'db:pin:user:{user_id}'
+
+
+def pin_to_primary(request, response):
+    """Read from the primary for REPLICA_PIN_SECONDS after this request"""
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+    response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(pin_key(user.pk), True, seconds)
+
+
+def pinned_to_primary(request):
+    """Whether request comes from a client that wrote within REPLICA_PIN_SECONDS"""
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pin clients to the primary after a successful write.
+
+    Runs after the view, when DRF has already authenticated the request, so
+    token-authenticated clients get a cache marker as well as the cookie.
+    Does nothing unless replicas are configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_set.aliases:
+            pin_to_primary(request, response)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Mixin for ViewSets to serve safe-method requests from a read replica.
+
+    Reads stay on the primary for clients pinned after a write, and when
+    the cache tags of the response (list_cache_tags / detail_cache_tags)
+    changed within REPLICA_MAX_LAG seconds: a lagging replica could still
+    return the old rows, which would then be cached under the new tag
+    generation.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = current_replica.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            current_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Authenticate, check permissions and throttle on the primary first.
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replica_set.aliases:
+            alias = None if self.needs_primary(request, *args, **kwargs) else replica_set.choose()
+            DB_READ_ROUTING.labels(alias or DEFAULT_DB_ALIAS).inc()
+            current_replica.set(alias)
+
+    def needs_primary(self, request, *args, **kwargs):
+        if pinned_to_primary(request):
+            return True
+        get_tags = getattr(self, 'detail_cache_tags' if self.detail else 'list_cache_tags', None)
+        if get_tags is None:
+            return False
+        from listings.caching import get_tags_last_changed
+
+        changed = get_tags_last_changed(get_tags(request, *args, **kwargs))
+        return time.time() - changed < getattr(settings, 'REPLICA_MAX_LAG', 2)
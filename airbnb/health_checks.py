@@ -5,6 +5,9 @@ Provides:
 - /health/ - Overall health status
 - /health/live/ - Liveness probe (is app running?)
 - /health/ready/ - Readiness probe (is app ready to serve?)
+
+/health/ and /health/ready/ never touch the dependencies themselves; they
+return the latest snapshot from HealthProber's background thread.
 """
 
 from rest_framework.decorators import api_view
@@ -14,64 +17,214 @@ from django.db import connection
 from django.db.utils import OperationalError
 from django.core.cache import cache
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from airbnb.db_routers import replica_reads, replica_set
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
-@api_view(['GET'])
-def health_check(request):
-    """
-    Comprehensive health check endpoint.
-    
-    Checks:
-    - Database connectivity
-    - Cache connectivity
-    - Celery broker
-    - Application status
-    """
-    health_status = {
-        'status': 'healthy',
-        'checks': {},
-    }
-
-    # Database check
+def check_database():
     try:
         with connection.cursor() as cursor:
             cursor.execute('SELECT 1')
-        health_status['checks']['database'] = {'status': 'ok'}
+        return {'status': 'ok'}
     except OperationalError as e:
-        health_status['checks']['database'] = {'status': 'error', 'error': str(e)}
-        health_status['status'] = 'unhealthy'
         logger.error(f'Database health check failed: {e}')
+        return {'status': 'error', 'error': str(e)}
+    finally:
+        # Runs in a prober thread: don't leave its connection open.
+        connection.close()
+
 
-    # Cache check
+def check_cache():
     try:
-        cache.set('health_check', 'ok', 10)
+        cache.set('health_check', 'ok', 30)
         if cache.get('health_check') == 'ok':
-            health_status['checks']['cache'] = {'status': 'ok'}
-        else:
-            health_status['checks']['cache'] = {'status': 'error', 'error': 'Cache miss'}
-            health_status['status'] = 'degraded'
+            return {'status': 'ok'}
+        return {'status': 'error', 'error': 'Cache miss'}
     except Exception as e:
-        health_status['checks']['cache'] = {'status': 'error', 'error': str(e)}
         logger.warning(f'Cache health check failed: {e}')
+        return {'status': 'error', 'error': str(e)}
 
-    # Celery check
+
+def check_celery():
     try:
         from celery import current_app
-        if current_app.control.inspect().ping():
-            health_status['checks']['celery'] = {'status': 'ok'}
-        else:
-            health_status['checks']['celery'] = {'status': 'error', 'error': 'No workers'}
-            health_status['status'] = 'degraded'
+        timeout = getattr(settings, 'HEALTH_PROBE_TIMEOUT', 2) / 2
+        if current_app.control.inspect(timeout=timeout).ping():
+            return {'status': 'ok'}
+        return {'status': 'error', 'error': 'No workers'}
     except Exception as e:
-        health_status['checks']['celery'] = {'status': 'warning', 'error': str(e)}
         logger.warning(f'Celery health check failed: {e}')
+        return {'status': 'warning', 'error': str(e)}
+
+
+def check_storage():
+    try:
+        default_storage.exists('health_check')
+        return {'status': 'ok'}
+    except Exception as e:
+        logger.warning(f'Storage health check failed: {e}')
+        return {'status': 'error', 'error': str(e)}
+
+
+def check_replicas():
+    lags = replica_set.measure()
+    usable = [alias for alias in lags if replica_set.usable(alias)]
+    if lags and not usable:
+        # Reads fall back to the primary, so the node still serves traffic.
+        return {'status': 'warning', 'error': 'No usable replica; reads go to the primary', 'lag': lags}
+    if len(usable) < len(lags):
+        return {'status': 'warning', 'lag': lags}
+    return {'status': 'ok', 'lag': lags}
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'celery': check_celery,
+    'storage': check_storage,
+    'replicas': check_replicas,
+}
+
+
+class HealthProber:
+    """
+    Background dependency prober whose latest results the health views serve.
+
+    Every HEALTH_PROBE_INTERVAL seconds a daemon thread runs the CHECKS in
+    parallel, each bounded by HEALTH_PROBE_TIMEOUT, and swaps in a new
+    snapshot. Requests only read that snapshot, so a load balancer polling
+    /health/ hard never reaches the dependencies. A check still hung from an
+    earlier round is reported as timed out rather than started again, so a
+    slow dependency cannot pile up threads.
+
+    The thread is started lazily in each process (after gunicorn forks).
+    """
+
+    def __init__(self, checks=CHECKS):
+        self.checks = checks
+        self.snapshot = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._running = {}
+        self._executor = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'HEALTH_PROBE_INTERVAL', 10)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'HEALTH_PROBE_TIMEOUT', 2)
+
+    @property
+    def stale_after(self):
+        """Seconds after which results are too old to vouch for"""
+        return self.interval * 3 + self.timeout
+
+    def get_snapshot(self):
+        """Latest snapshot; the first call in a process waits for the first probe"""
+        self.start()
+        if self.snapshot is None:
+            self._ready.wait(self.timeout * 2)
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {'status': 'starting', 'checks': {}, 'age': None}
+        age = time.time() - snapshot['checked_at']
+        if age > self.stale_after:
+            # The prober has stopped refreshing; don't vouch for old results.
+            return dict(snapshot, status='unhealthy', age=round(age, 1), stale=True)
+        return dict(snapshot, age=round(age, 1))
 
+    def start(self):
+        """Start this process's prober thread if it isn't running"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.snapshot = None
+            self._ready.clear()
+            self._running = {}
+            self._executor = ThreadPoolExecutor(max_workers=len(self.checks), thread_name_prefix='health-check')
+            threading.Thread(target=self._run, name='health-prober', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error(f'Health prober failed: {e}')
+            time.sleep(self.interval)
+
+    def probe(self):
+        """Run every check once and publish the new snapshot"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.checks), thread_name_prefix='health-check')
+        for name, check in self.checks.items():
+            if name not in self._running or self._running[name].done():
+                self._running[name] = self._executor.submit(self._timed, check)
+        deadline = time.monotonic() + self.timeout
+        checks = {}
+        for name, future in self._running.items():
+            try:
+                checks[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeout:
+                checks[name] = {'status': 'error', 'error': f'Timed out after {self.timeout}s'}
+            except Exception as e:
+                checks[name] = {'status': 'error', 'error': str(e)}
+        self.snapshot = {
+            'status': self.overall_status(checks),
+            'checks': checks,
+            'checked_at': time.time(),
+        }
+        self._ready.set()
+        return self.snapshot
+
+    @staticmethod
+    def _timed(check):
+        started = time.perf_counter()
+        result = check()
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    @staticmethod
+    def overall_status(checks):
+        if checks.get('database', {}).get('status') != 'ok':
+            return 'unhealthy'
+        if any(result['status'] == 'error' for result in checks.values()):
+            return 'degraded'
+        return 'healthy'
+
+
+health_prober = HealthProber()
+
+
+@api_view(['GET'])
+def health_check(request):
+    """
+    Comprehensive health check endpoint.
+    
+    Serves the latest HealthProber snapshot of:
+    - Database connectivity
+    - Cache connectivity
+    - Celery broker
+    - Media storage
+    """
+    health_status = health_prober.get_snapshot()
+    # Only the database decides the 503; other failures report 'degraded'.
     http_status = (
         status.HTTP_200_OK
-        if health_status['status'] == 'healthy'
+        if health_status['status'] in ('healthy', 'degraded')
         else status.HTTP_503_SERVICE_UNAVAILABLE
     )
 
@@ -101,16 +254,15 @@ def readiness_probe(request):
     Kubernetes readiness probe.
     
     Returns 200 only if application is ready to serve traffic.
-    Checks critical dependencies: database, cache.
+    Checks critical dependencies (database, cache) in the latest
+    HealthProber snapshot.
     """
-    try:
-        # Check database
-        with connection.cursor() as cursor:
-            cursor.execute('SELECT 1')
-
-        # Check cache
-        cache.set('ready_check', 'ok', 5)
-
+    snapshot = health_prober.get_snapshot()
+    failing = [
+        name for name in ('database', 'cache')
+        if snapshot['checks'].get(name, {}).get('status') != 'ok'
+    ]
+    if not failing and not snapshot.get('stale'):
         return Response(
             {
                 'status': 'ready',
@@ -118,64 +270,35 @@ def readiness_probe(request):
             },
             status=status.HTTP_200_OK
         )
-    except Exception as e:
-        logger.error(f'Readiness check failed: {e}')
-        return Response(
-            {
-                'status': 'not_ready',
-                'message': str(e),
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+    message = 'Health snapshot is stale' if snapshot.get('stale') else f'Failing checks: {", ".join(failing)}'
+    logger.error(f'Readiness check failed: {message}')
+    return Response(
+        {
+            'status': 'not_ready',
+            'message': message,
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
 
 
 @api_view(['GET'])
 def metrics(request):
     """
-    Prometheus-compatible metrics endpoint.
+    Prometheus metrics endpoint.
     
-    Returns application metrics in text format.
-    Compatible with standard monitoring tools.
+    Returns request, cache, rate limiter and Celery metrics aggregated
+    across worker processes (see airbnb.metrics), plus database gauges, in
+    the Prometheus text exposition format. Any reads go to a replica.
     """
-    from django.db import connections
-    from django.contrib.auth.models import User
-    from listings.models import Property, Booking
+    from airbnb.metrics import render_metrics
 
     try:
-        # Application metrics
-        metrics_lines = [
-            '# HELP airbnb_users_total Total number of users',
-            f'# TYPE airbnb_users_total gauge',
-            f'airbnb_users_total {User.objects.count()}',
-            '',
-            '# HELP airbnb_properties_total Total number of properties',
-            f'# TYPE airbnb_properties_total gauge',
-            f'airbnb_properties_total {Property.objects.count()}',
-            '',
-            '# HELP airbnb_bookings_total Total number of bookings',
-            f'# TYPE airbnb_bookings_total gauge',
-            f'airbnb_bookings_total {Booking.objects.count()}',
-            '',
-            '# HELP airbnb_active_bookings_total Active bookings',
-            f'# TYPE airbnb_active_bookings_total gauge',
-            f'airbnb_active_bookings_total {Booking.objects.filter(reservation_state__in=["approved", "completed"]).count()}',
-            '',
-        ]
-
-        # Database connection pool stats
-        db_stats = connections['default'].get_autocommit()
-        metrics_lines.extend([
-            '# HELP django_database_connected Database connection status',
-            '# TYPE django_database_connected gauge',
-            f'django_database_connected {1 if db_stats is not None else 0}',
-            '',
-        ])
-
-        metrics_text = '\n'.join(metrics_lines)
-        return Response(metrics_text, content_type='text/plain', status=status.HTTP_200_OK)
+        with replica_reads():
+            body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
     except Exception as e:
         logger.error(f'Metrics endpoint error: {e}')
-        return Response(
+        return HttpResponse(
             f'# Error generating metrics: {str(e)}',
             content_type='text/plain',
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
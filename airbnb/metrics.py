@@ -0,0 +1,238 @@
+"""
+Prometheus metrics for the API, cache, rate limiter and Celery tasks.
+
+Metrics are defined once here and updated where the events happen. Under
+gunicorn (or a prefork Celery worker) each process writes its samples to
+mmap files in PROMETHEUS_MULTIPROC_DIR, and a scrape aggregates all of
+them, so every worker reports the same totals. The directory must be set
+in the environment before the app starts and emptied on every restart
+(see gunicorn.conf.py). Without it metrics are kept in process memory,
+which is fine for runserver and tests.
+"""
+
+import logging
+import os
+import time
+
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.exposition import CONTENT_TYPE_LATEST
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, Prometheus' default buckets; +Inf is implicit.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+registry = CollectorRegistry()
+
+REQUESTS = Counter(
+    'airbnb_http_requests_total', 'HTTP requests by method, URL name and status code',
+    ['method', 'route', 'status'], registry=registry
+)
+REQUEST_LATENCY = Histogram(
+    'airbnb_http_request_duration_seconds', 'HTTP request latency by method and URL name',
+    ['method', 'route'], buckets=LATENCY_BUCKETS, registry=registry
+)
+REQUEST_DB_QUERIES = Counter(
+    'airbnb_http_request_db_queries_total', 'SQL statements executed while serving requests',
+    ['route'], registry=registry
+)
+CACHE_REQUESTS = Counter(
+    'airbnb_cache_requests_total', 'Two-tier cache lookups by tier and result',
+    ['tier', 'result'], registry=registry
+)
+RATE_LIMIT_DECISIONS = Counter(
+    'airbnb_rate_limit_decisions_total', 'Throttling decisions by endpoint rule scope',
+    ['scope', 'result'], registry=registry
+)
+CELERY_TASKS = Counter(
+    'airbnb_celery_tasks_total', 'Finished Celery tasks by task name and state',
+    ['task', 'state'], registry=registry
+)
+CELERY_TASK_LATENCY = Histogram(
+    'airbnb_celery_task_duration_seconds', 'Celery task run time by task name',
+    ['task'], buckets=LATENCY_BUCKETS + (30.0, 60.0, 300.0), registry=registry
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'airbnb_db_connections_opened_total', 'Database connections opened by alias',
+    ['alias'], registry=registry
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'airbnb_db_pool_connections', 'Pooled database connections by state (in_use, idle)',
+    ['alias', 'state'], multiprocess_mode='livesum', registry=registry
+)
+DB_POOL_CHECKOUTS = Counter(
+    'airbnb_db_pool_checkouts_total', 'Pool checkouts by result (reused, new, timeout)',
+    ['alias', 'result'], registry=registry
+)
+DB_POOL_WAIT = Histogram(
+    'airbnb_db_pool_wait_seconds', 'Time spent waiting for a free pooled connection',
+    ['alias'], buckets=LATENCY_BUCKETS, registry=registry
+)
+DB_READ_ROUTING = Counter(
+    'airbnb_db_read_routing_total', 'Replica-eligible requests by the database their reads went to',
+    ['database'], registry=registry
+)
+DB_REPLICA_LAG = Gauge(
+    'airbnb_db_replica_lag_seconds', 'Last measured replication lag of each read replica',
+    ['alias'], multiprocess_mode='livemax', registry=registry
+)
+
+# Business gauges served from cache counters (see ApplicationMetricsCollector)
+BUSINESS_GAUGES = {
+    'airbnb_users_total': 'Total number of users',
+    'airbnb_properties_total': 'Total number of properties',
+    'airbnb_bookings_total': 'Total number of bookings',
+    'airbnb_active_bookings_total': 'Active bookings',
+}
+ACTIVE_BOOKING_GAUGE_STATES = ('approved', 'completed')
+RECONCILE_QUEUED_KEY = 'metrics:reconcile_queued'
+RECONCILE_QUEUED_TIMEOUT = 300  # seconds between reconciles queued by scrapes
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def reset_multiprocess_dir():
+    """
+    Empty PROMETHEUS_MULTIPROC_DIR before any worker starts; files left by
+    a previous run would otherwise be added to the new run's totals.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+
+def mark_process_dead(pid):
+    """Drop the live-only samples of a worker process that has exited"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+@receiver(connection_created)
+def count_connection_opened(sender, connection, **kwargs):
+    # Pooled backends count only real connects, not checkouts.
+    if not getattr(connection, 'pooled', False):
+        DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+
+
+def business_gauge_key(name):
+    return f'metrics:gauge:{name}'
+
+
+def adjust_business_gauge(name, delta):
+    """Move a business gauge by delta; a missing counter waits for reconciling"""
+    try:
+        cache.incr(business_gauge_key(name), delta)
+    except ValueError:
+        pass
+    except Exception as e:
+        logger.warning(f'Failed to adjust business gauge {name}: {e}')
+
+
+def set_business_gauges(values):
+    cache.set_many({business_gauge_key(name): value for name, value in values.items()}, None)
+
+
+def get_business_gauges():
+    """{gauge name: value} for the business gauges currently in the cache"""
+    keys = {business_gauge_key(name): name for name in BUSINESS_GAUGES}
+    return {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+
+class ApplicationMetricsCollector:
+    """
+    Business gauges, collected when /metrics/ is scraped.
+
+    The values are counters kept in the cache: model signals move them as
+    rows are created, deleted or change state, and the
+    reconcile_business_metrics task resets them to exact counts every few
+    minutes. A scrape is a single cache read, whatever the table sizes. If
+    the counters are missing (new cache, eviction), a reconcile is queued
+    and the gauges are left out until it has run; if the broker is down the
+    scrape goes on and the scheduled reconcile restores them.
+    """
+
+    def collect(self):
+        from django.db import DatabaseError, connections
+
+        values = get_business_gauges()
+        if len(values) < len(BUSINESS_GAUGES) and cache.add(RECONCILE_QUEUED_KEY, True, RECONCILE_QUEUED_TIMEOUT):
+            self.queue_reconcile()
+        for name, documentation in BUSINESS_GAUGES.items():
+            if name in values:
+                yield GaugeMetricFamily(name, documentation, value=values[name])
+
+        try:
+            connections['default'].ensure_connection()
+            connected = True
+        except DatabaseError:
+            connected = False
+        yield GaugeMetricFamily('django_database_connected', 'Database connection status', value=int(connected))
+
+    @staticmethod
+    def queue_reconcile():
+        # One publish attempt, no retries: a broker outage must not stall or
+        # break the scrape. The beat schedule reconciles regardless.
+        from listings.tasks import reconcile_business_metrics
+        try:
+            reconcile_business_metrics.apply_async(retry=False)
+        except Exception as e:
+            logger.warning(f'Failed to queue business metrics reconcile: {e}')
+
+
+def scrape_registry(include_application=True):
+    """
+    Registry to render for one scrape: the samples of every process when
+    multiprocess mode is on, else this process's, plus the database gauges.
+    """
+    scraped = CollectorRegistry()
+    if multiprocess_enabled():
+        multiprocess.MultiProcessCollector(scraped)
+    else:
+        scraped.register(registry)
+    if include_application:
+        scraped.register(ApplicationMetricsCollector())
+    return scraped
+
+
+def render_metrics():
+    """(body, content type) in the Prometheus text exposition format"""
+    return generate_latest(scrape_registry()), CONTENT_TYPE_LATEST
+
+
+_task_started = {}
+
+
+def celery_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def celery_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    name = getattr(task, 'name', 'unknown')
+    CELERY_TASKS.labels(name, state or 'UNKNOWN').inc()
+    if started is not None:
+        CELERY_TASK_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+
+def celery_worker_init(**kwargs):
+    reset_multiprocess_dir()
+
+
+def celery_worker_ready(**kwargs):
+    """Serve the worker's metrics on CELERY_METRICS_PORT, if set"""
+    port = os.environ.get('CELERY_METRICS_PORT')
+    if not port:
+        return
+    from prometheus_client import start_http_server
+    start_http_server(int(port), registry=scrape_registry(include_application=False))
+    logger.info(f'Serving Celery metrics on port {port}')
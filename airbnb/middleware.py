@@ -4,15 +4,20 @@ Performance monitoring and request tracking middleware.
 Tracks:
 - Response times
 - Request/response sizes
-- Database query counts
-- Cache hits/misses
+- Database query counts and time
+- Cache and serialization time
+- Per-route request counts and latency (Prometheus)
 """
 
 import time
 import logging
-from django.db import connection
+from contextlib import ExitStack
+from django.db import connections
 from django.conf import settings
 
+from .metrics import REQUEST_DB_QUERIES, REQUEST_LATENCY, REQUESTS
+from .timing import QueryTimer, RequestTimings, current_timings
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,9 +30,15 @@ class PerformanceMonitoringMiddleware:
     - Database queries executed
     - Response size
     - Status code
+
+    SQL is counted and timed through execute_wrapper on every database
+    connection, so the numbers are real with DEBUG off. Responses carry a
+    Server-Timing header (db, cache, serialize, total), and each request is
+    recorded in the Prometheus metrics under its URL name.
     """
 
     SLOW_REQUEST_THRESHOLD = 1.0  # seconds
+    SERVER_TIMING_METRICS = ('cache', 'serialize')
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -37,13 +48,26 @@ class PerformanceMonitoringMiddleware:
         if self._should_skip(request.path):
             return self.get_response(request)
 
-        start_time = time.time()
-        start_queries = len(connection.queries)
+        query_timer = QueryTimer()
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start_time = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(query_timer))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
 
-        response = self.get_response(request)
+        duration = time.perf_counter() - start_time
+        query_count = query_timer.count
 
-        duration = time.time() - start_time
-        query_count = len(connection.queries) - start_queries
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = resolver_match.view_name if resolver_match else '<unmatched>'
+        REQUESTS.labels(request.method, route, response.status_code).inc()
+        REQUEST_LATENCY.labels(request.method, route).observe(duration)
+        REQUEST_DB_QUERIES.labels(route).inc(query_count)
 
         # Log slow requests
         if duration > self.SLOW_REQUEST_THRESHOLD:
@@ -62,9 +86,18 @@ class PerformanceMonitoringMiddleware:
         # Add performance headers to response
         response['X-Response-Time'] = f'{duration:.3f}s'
         response['X-DB-Queries'] = str(query_count)
+        response['Server-Timing'] = self._server_timing(query_timer, timings, duration)
 
         return response
 
+    def _server_timing(self, query_timer, timings, duration):
+        """Server-Timing header value; durations are in milliseconds"""
+        entries = [f'db;dur={query_timer.duration * 1000:.1f};desc="{query_timer.count} queries"']
+        for metric in self.SERVER_TIMING_METRICS:
+            entries.append(f'{metric};dur={timings.durations.get(metric, 0.0) * 1000:.1f}')
+        entries.append(f'total;dur={duration * 1000:.1f}')
+        return ', '.join(entries)
+
     @staticmethod
     def _should_skip(path):
         """Skip logging for health checks and static files."""
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -51,6 +52,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'airbnb.middleware.PerformanceMonitoringMiddleware',
     'listings.rate_limiting.RateLimitMiddleware',
+    'airbnb.db_routers.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'airbnb.urls'
@@ -81,9 +83,51 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'airbnb_pass'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests instead of reconnecting
+        # (TCP, auth and a backend fork) every time; check a reused one
+        # before its first query so a dropped connection isn't handed out.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        # Named cursors (QuerySet.iterator()) outlive a transaction, which a
+        # transaction-pooling PgBouncer can't route; turn them off behind one.
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
     }
 }
 
+# Share a bounded pool of connections between the threads of each worker
+# process (gthread or async workers). Connections go back to the pool at
+# the end of each request, so CONN_MAX_AGE no longer applies.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '0'))
+if DB_POOL_MAX_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'airbnb.db_backends.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+            },
+        },
+    })
+
+# Read replicas: comma-separated hosts sharing the primary's database,
+# credentials and port. Listing, photo and review reads go to them (see
+# airbnb.db_routers); writes and transactions always use 'default'.
+REPLICA_DATABASES = []
+for index, replica_host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host.strip(),
+        'OPTIONS': {**DATABASES['default'].get('OPTIONS', {}), 'connect_timeout': 2},
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['airbnb.db_routers.ReplicaRouter']
+# Replicas further behind than this many seconds are skipped.
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', '2'))
+# How long a client reads from the primary after writing.
+REPLICA_PIN_SECONDS = float(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -127,6 +171,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'airbnb.timing.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -146,6 +194,16 @@ REST_FRAMEWORK = {
     },
 }
 
+# Per-endpoint rate limits merged over listings.rate_limiting.ThrottleEngine
+# .ENDPOINT_LIMITS. Keys are path prefixes ('/api/token/') or URL names
+# ('property-detail'); values are requests per hour or
+# {'limit': 50, 'methods': {'POST': 10}, 'roles': {'host': 200}}.
+RATE_LIMIT_RULES = {}
+
+# Page-number responses count exactly below this many rows; above it they
+# report the PostgreSQL planner estimate (see listings.pagination).
+PAGINATION_EXACT_COUNT_THRESHOLD = int(os.environ.get('PAGINATION_EXACT_COUNT_THRESHOLD', '10000'))
+
 CORS_ALLOWED_ORIGINS = os.environ.get(
     'CORS_ALLOWED_ORIGINS',
     'http://localhost:3000,http://localhost:8000'
@@ -162,11 +220,14 @@ CELERY_RESULT_BACKEND = os.environ.get(
     os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 )
 CELERY_ACCEPT_CONTENT = ['json']
+# Bound publishes from web requests (e.g. /metrics/) when the broker is unreachable
+CELERY_BROKER_TRANSPORT_OPTIONS = {'socket_connect_timeout': 2}
 
 # Cache Configuration (Redis)
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        # django_redis RedisCache that reports its time in Server-Timing
+        'BACKEND': 'airbnb.cache_backends.TimedRedisCache',
         'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/1'),
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -200,6 +261,32 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Periodic tasks run by `celery -A airbnb beat` (see Procfile)
+from celery.schedules import crontab
+
+CELERY_BEAT_SCHEDULE = {
+    'warm-homepage': {
+        'task': 'listings.tasks.warm_homepage',
+        'schedule': timedelta(minutes=5),
+    },
+    'warm-popular-listings': {
+        'task': 'listings.tasks.warm_popular_listings',
+        'schedule': timedelta(minutes=10),
+    },
+    'refresh-availability-calendars': {
+        'task': 'listings.tasks.refresh_availability_calendars',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'reconcile-business-metrics': {
+        'task': 'listings.tasks.reconcile_business_metrics',
+        'schedule': timedelta(minutes=10),
+    },
+}
+
+# Host the cache warmers request pages as; must match the public API host
+# because cached detail pages contain absolute photo URLs.
+CACHE_WARMING_HOST = os.environ.get('CACHE_WARMING_HOST', ALLOWED_HOSTS[0])
+
 # Email Configuration
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -357,6 +444,11 @@ HEALTH_CHECK = {
     'MEMORY_MIN': 100,     # Alert if memory < 100MB
 }
 
+# /health/ and /health/ready/ serve a snapshot refreshed in the background
+# every HEALTH_PROBE_INTERVAL seconds; each check gets HEALTH_PROBE_TIMEOUT.
+HEALTH_PROBE_INTERVAL = float(os.environ.get('HEALTH_PROBE_INTERVAL', '10'))
+HEALTH_PROBE_TIMEOUT = float(os.environ.get('HEALTH_PROBE_TIMEOUT', '2'))
+
 import logging
 
 LOGGING = {
@@ -12,6 +12,7 @@ DATABASES = {
         'NAME': ':memory:',
     }
 }
+REPLICA_DATABASES = []
 
 # Celery - execute tasks synchronously during tests
 CELERY_TASK_ALWAYS_EAGER = True
@@ -35,7 +36,7 @@ SENTRY_DSN = ''
 # Use simpler cache backend
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'airbnb.cache_backends.TimedLocMemCache',
         'LOCATION': 'test-cache',
     }
 }
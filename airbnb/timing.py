@@ -0,0 +1,72 @@
+"""
+Request timing primitives used by PerformanceMonitoringMiddleware.
+
+The middleware opens a RequestTimings for each request; code that wants
+its time reported in the Server-Timing header wraps the work in
+timed('<metric>'). SQL is timed by QueryTimer through
+connection.execute_wrapper, so it works with DEBUG off.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework.renderers import JSONRenderer
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulated seconds per Server-Timing metric for one request"""
+
+    def __init__(self):
+        self.durations = {}
+        self._active = set()
+
+    def add(self, metric, seconds):
+        self.durations[metric] = self.durations.get(metric, 0.0) + seconds
+
+
+@contextmanager
+def timed(metric):
+    """
+    Add the block's wall time to metric on the current request.
+
+    Outside a request this does nothing. Nested blocks for the same metric
+    (e.g. a cache call made by another cache call) are only counted once.
+    """
+    timings = current_timings.get()
+    if timings is None or metric in timings._active:
+        yield
+        return
+    timings._active.add(metric)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(metric)
+        timings.add(metric, time.perf_counter() - started)
+
+
+class QueryTimer:
+    """connection.execute_wrapper that counts and times SQL statements"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer whose rendering time is reported as 'serialize'"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
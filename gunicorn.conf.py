@@ -0,0 +1,14 @@
+"""
+Gunicorn settings, loaded automatically from the working directory.
+Command-line options (see docker-compose.prod.yml, Procfile) still apply.
+"""
+
+from airbnb.metrics import mark_process_dead, reset_multiprocess_dir
+
+
+def on_starting(server):
+    reset_multiprocess_dir()
+
+
+def child_exit(server, worker):
+    mark_process_dead(worker.pid)
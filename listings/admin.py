@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, Property, PropertyImage, Booking, Payment, Review, Wishlist, Address, CustomerPreferences
+from .models import UserProfile, Property, PropertyAvailability, PropertyImage, Booking, Payment, Review, Wishlist, Address, CustomerPreferences
 
 
 @admin.register(UserProfile)
@@ -23,6 +23,14 @@ class PhotoAdministration(admin.ModelAdmin):
     list_filter = ['set_as_primary', 'uploaded_at']
 
 
+@admin.register(PropertyAvailability)
+class AvailabilityAdministration(admin.ModelAdmin):
+    list_display = ['listing', 'horizon_start', 'refreshed_at']
+    search_fields = ['listing__listing_title']
+    readonly_fields = ['listing', 'horizon_start', 'refreshed_at']
+    exclude = ['booked_nights']
+
+
 @admin.register(Booking)
 class ReservationAdministration(admin.ModelAdmin):
     list_display = ['reserved_property', 'guest', 'arrival_date', 'departure_date', 'reservation_state']
@@ -6,61 +6,670 @@ Implements caching strategy for:
 - Reviews (cache for 30 minutes)
 - User profiles (cache for 15 minutes)
 - Search results (cache for 5 minutes)
+
+Model signals (see listings.models) invalidate the affected tags after the
+writing transaction commits, so admin, management command and Celery writes
+expire cached pages as reliably as API writes. That is what lets the
+listing and review endpoints keep responses for a day.
+
+Invalidation is tag based: every cached entry is keyed under the current
+generation of the tags it depends on (e.g. 'listings', 'property:42').
+Invalidating a tag is a single INCR of its generation counter, which makes
+every entry built under the old generation unreachable without enumerating
+keys; orphaned entries simply age out through their TTL.
 """
 
-from django.views.decorators.cache import cache_page
-from django.views.decorators.http import condition
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from rest_framework.response import Response
+from airbnb.metrics import CACHE_REQUESTS
 from functools import wraps
+from collections import OrderedDict
+import gzip
 import hashlib
+import json
 import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are stored
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
 # Cache TTL (Time To Live) in seconds
 CACHE_TTL = {
-    'properties': 3600,      # 1 hour
-    'property_detail': 1800, # 30 minutes
-    'reviews': 1800,         # 30 minutes
+    'properties': 86400,     # 24 hours, invalidated by model signals
+    'property_detail': 86400, # 24 hours, invalidated by model signals
+    'reviews': 86400,        # 24 hours, invalidated by model signals
     'profiles': 900,         # 15 minutes
     'search': 300,           # 5 minutes
     'bookings': 600,         # 10 minutes
 }
 
+# Stampede protection (see get_or_recompute)
+STALE_GRACE_PERIOD = 300     # seconds an expired entry may still be served
+STAMPEDE_LOCK_TIMEOUT = 30   # seconds a rebuild may hold the lock
+STAMPEDE_WAIT_TIMEOUT = 5    # seconds a cold miss waits for the rebuild
+STAMPEDE_POLL_INTERVAL = 0.05
+XFETCH_BETA = 1.0            # >1 recomputes earlier, <1 later
+
+# In-process L1 in front of Redis (see TwoTierCache)
+L1_CACHE_SIZE = 1024         # entries per process
+L1_CACHE_TTL = 5             # seconds; bounds staleness if an invalidation is missed
+L1_INVALIDATION_CHANNEL = 'cache:l1:invalidate'
+
+# Pre-compressed variants stored by cache_rendered_response
+RESPONSE_COMPRESSION_MIN_LENGTH = 512   # bytes; smaller bodies are stored as-is
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 5
+
+# Cache warming
+POPULAR_PROPERTIES_WARM_COUNT = 20
+HOMEPAGE_FEATURED_COUNT = 6
+HOMEPAGE_FEATURED_KEY = 'homepage_featured_properties'
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe in-process LRU with a per-entry TTL.
+
+    Entries expire after ttl seconds and the least recently used entry is
+    evicted once maxsize is reached. None cannot be stored.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
 
-def cache_response(ttl_key='properties', cache_key_func=None):
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TwoTierCache:
     """
-    Decorator to cache API responses.
+    Per-process LRU (L1) in front of the shared django-redis cache (L2).
+
+    For tiny, very hot values such as tag generations and popular listing
+    pages: an L1 hit costs neither a Redis round trip nor zlib
+    decompression. Writes and deletes made through this class are published
+    on L1_INVALIDATION_CHANNEL, and a subscriber thread in every process
+    drops its L1 copy of those keys. If a message is lost, L1_CACHE_TTL
+    bounds how long a stale copy can be served.
+
+    Values must be treated as read-only: an L1 hit returns the same object
+    to every caller in the process.
+    """
+
+    def __init__(self, maxsize=L1_CACHE_SIZE, ttl=L1_CACHE_TTL, channel=L1_INVALIDATION_CHANNEL):
+        self.local = LocalLRUCache(maxsize, ttl)
+        self.channel = channel
+        self.origin = None
+        self._pid = None
+        self._setup_lock = threading.Lock()
+        self._counters = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0}
+        self._counters_lock = threading.Lock()
+
+    def get(self, key):
+        self._ensure_subscriber()
+        value = self.local.get(key)
+        if value is not None:
+            self._count(l1_hits=1)
+            return value
+        value = cache.get(key)
+        if value is None:
+            self._count(l1_misses=1, l2_misses=1)
+        else:
+            self._count(l1_misses=1, l2_hits=1)
+            self.local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        self._ensure_subscriber()
+        found = {}
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+        missing = [key for key in keys if key not in found]
+        fetched = cache.get_many(missing) if missing else {}
+        for key, value in fetched.items():
+            self.local.set(key, value)
+        self._count(
+            l1_hits=len(found), l1_misses=len(missing),
+            l2_hits=len(fetched), l2_misses=len(missing) - len(fetched)
+        )
+        found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout):
+        self._ensure_subscriber()
+        cache.set(key, value, timeout)
+        self.local.set(key, value)
+        self._publish([key])
+
+    def add(self, key, value, timeout):
+        return cache.add(key, value, timeout)
+
+    def delete(self, key):
+        cache.delete(key)
+        self.invalidate([key])
+
+    def invalidate(self, keys):
+        """Drop keys from every process's L1; the Redis copy is untouched"""
+        self._ensure_subscriber()
+        for key in keys:
+            self.local.delete(key)
+        self._publish(keys)
+
+    def clear(self):
+        """Empty the L1 in every process"""
+        self._ensure_subscriber()
+        self.local.clear()
+        self._publish(None)
+
+    def stats(self):
+        """Hit ratios per tier, counted since this process started"""
+        with self._counters_lock:
+            counters = dict(self._counters)
+        l1 = _tier_stats(counters['l1_hits'], counters['l1_misses'])
+        l1['size'] = len(self.local)
+        return {'l1': l1, 'l2': _tier_stats(counters['l2_hits'], counters['l2_misses'])}
+
+    def _count(self, **increments):
+        with self._counters_lock:
+            for name, amount in increments.items():
+                self._counters[name] += amount
+        for name, amount in increments.items():
+            if amount:
+                tier, result = name.split('_')
+                CACHE_REQUESTS.labels(tier, result[:-2] if result == 'misses' else result[:-1]).inc(amount)
+
+    def _redis(self):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except (ImportError, NotImplementedError):
+            # Not a Redis backend: there is no other process to notify.
+            return None
+
+    def _publish(self, keys):
+        connection = self._redis()
+        if connection is None:
+            return
+        try:
+            connection.publish(self.channel, json.dumps({'origin': self.origin, 'keys': keys}))
+        except Exception as e:
+            logger.warning(f'Failed to publish L1 cache invalidation: {e}')
+
+    def _handle_message(self, data):
+        payload = json.loads(data)
+        if payload.get('origin') == self.origin:
+            return
+        if payload.get('keys') is None:
+            self.local.clear()
+            return
+        for key in payload['keys']:
+            self.local.delete(key)
+
+    def _ensure_subscriber(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._setup_lock:
+            if self._pid == pid:
+                return
+            # A forked worker inherits the parent's L1 but not its thread.
+            self._pid = pid
+            self.origin = uuid.uuid4().hex
+            self.local.clear()
+            if self._redis() is not None:
+                threading.Thread(
+                    target=self._listen, name='cache-l1-invalidation', daemon=True
+                ).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Anything published while we were not subscribed is lost.
+                self.local.clear()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle_message(message['data'])
+            except Exception as e:
+                logger.warning(f'L1 cache invalidation listener failed: {e}')
+                self.local.clear()
+                time.sleep(1)
+
+
+def _tier_stats(hits, misses):
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+hot_cache = TwoTierCache()
+
+
+# Tags each TTL bucket depends on when cache_response is not given tags
+DEFAULT_TAGS = {
+    'properties': ('listings',),
+    'property_detail': ('listings',),
+    'reviews': ('reviews',),
+    'profiles': ('profiles',),
+    'search': ('listings',),
+    'bookings': ('bookings',),
+}
+
+
+def tag_version_key(tag):
+    """Cache key holding the generation counter for a tag"""
+    return f'cache_tag:{tag}:gen'
+
+
+def tag_changed_key(tag):
+    """Cache key holding the Unix time a tag was last invalidated"""
+    return f'cache_tag:{tag}:changed'
+
+
+def property_tag(property_id):
+    return f'property:{property_id}'
+
+
+def property_reviews_tag(property_id):
+    return f'reviews:property:{property_id}'
+
+
+def get_tag_versions(tags):
+    """
+    Return the current generation of each tag.
+
+    Generations are read through hot_cache, so a warm process resolves them
+    without touching Redis. A missing counter is seeded with a nanosecond
+    timestamp rather than 0, so an evicted counter can never fall back to a
+    generation that still has entries cached under it.
+    """
+    keys = [tag_version_key(tag) for tag in tags]
+    versions = hot_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            hot_cache.add(key, time.time_ns(), None)
+            versions[key] = hot_cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_tags_last_changed(tags):
+    """
+    Unix time of the most recent invalidation of any of the given tags.
+
+    A tag with no recorded change (new, or evicted) is stamped with the
+    current time, which errs towards clients refetching.
+    """
+    keys = [tag_changed_key(tag) for tag in tags]
+    changed = hot_cache.get_many(keys)
+    for key in keys:
+        if key not in changed:
+            hot_cache.add(key, time.time(), None)
+            changed[key] = hot_cache.get(key)
+    return max(changed.values(), default=0)
+
+
+def make_tagged_key(base_key, tags):
+    """Build the versioned cache key for base_key under the given tags"""
+    digest = hashlib.md5(base_key.encode('utf-8')).hexdigest()
+    versions = '.'.join(str(version) for version in get_tag_versions(tags))
+    return f'tagged:{digest}:{versions}'
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every cache entry that depends on any of the given tags.
+
+    Usage:
+        invalidate_tags('listings', property_tag(42))
+    """
+    keys = []
+    changed_at = time.time()
+    for tag in tags:
+        key = tag_version_key(tag)
+        keys.extend([key, tag_changed_key(tag)])
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Counter missing or evicted: any fresh seed invalidates.
+                cache.add(key, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f'Failed to invalidate cache tag {tag}: {e}')
+    try:
+        cache.set_many({tag_changed_key(tag): changed_at for tag in tags}, None)
+    except Exception as e:
+        logger.warning(f'Failed to record cache tag change time: {e}')
+    hot_cache.invalidate(keys)
+
+
+def invalidate_tags_on_commit(*tags, using=None):
+    """
+    Invalidate tags once the current transaction commits.
+
+    Inside an atomic block the tags are also bumped straight away, so reads
+    later in the same transaction miss the cache; the on_commit bump then
+    drops anything another worker cached from the pre-commit rows while the
+    transaction was open. Outside a transaction this is a single bump.
+    """
+    if transaction.get_connection(using).in_atomic_block:
+        invalidate_tags(*tags)
+    transaction.on_commit(lambda: invalidate_tags(*tags), using=using)
+
+
+def _xfetch_due(entry, beta):
+    """
+    XFetch early-expiry test (Vattani et al., "Optimal Probabilistic Cache
+    Stampede Prevention"). Each reader recomputes early with a probability
+    that rises as expiry nears and with how long the value took to build,
+    so one request usually refreshes a hot key before it ever expires.
+    """
+    gap = -entry['delta'] * beta * math.log(1.0 - random.random())
+    return time.time() + gap >= entry['expires_at']
+
+
+def _recompute(key, compute, ttl, cacheable, store):
+    started = time.perf_counter()
+    value = compute()
+    if cacheable is None or cacheable(value):
+        store.set(key, {
+            'value': value,
+            'delta': time.perf_counter() - started,
+            'expires_at': time.time() + ttl,
+        }, ttl + STALE_GRACE_PERIOD)
+    return value
+
+
+def refresh_cached_value(key, compute, ttl, cacheable=None, local=False):
+    """
+    Rebuild key under its stampede lock. With local=True the value is also
+    kept in this process's L1 (hot_cache).
+
+    Returns (True, value) after rebuilding, or (False, None) when another
+    worker already holds the lock and is rebuilding the same key.
+    """
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, STAMPEDE_LOCK_TIMEOUT):
+        return False, None
+    try:
+        store = hot_cache if local else cache
+        return True, _recompute(key, compute, ttl, cacheable, store)
+    finally:
+        # Only release our own lock; it may have timed out and moved on.
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def get_or_recompute(key, compute, ttl, cacheable=None, beta=XFETCH_BETA, local=False):
+    """
+    Return the cached value for key, rebuilding it with compute() at most
+    once across workers.
+
+    Entries outlive their logical TTL by STALE_GRACE_PERIOD. When an entry
+    is due for recomputation (XFetch, or actually expired) the first worker
+    to take a short lock rebuilds it while everyone else keeps serving the
+    current value. On a cold miss the other workers wait for the lock holder
+    instead of all hitting the database at once.
+    
+    cacheable, if given, decides whether a computed value may be stored.
+    local=True reads and writes through hot_cache, for small hot values.
+    """
+    store = hot_cache if local else cache
+    entry = store.get(key)
+    if entry is not None and not _xfetch_due(entry, beta):
+        return entry['value']
+    
+    rebuilt, value = refresh_cached_value(key, compute, ttl, cacheable, local)
+    if rebuilt:
+        return value
+    
+    if entry is not None:
+        return entry['value']
+    
+    deadline = time.monotonic() + STAMPEDE_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(STAMPEDE_POLL_INTERVAL)
+        entry = store.get(key)
+        if entry is not None:
+            return entry['value']
+        if cache.get(f'{key}:lock') is None:
+            entry = store.get(key)
+            if entry is not None:
+                return entry['value']
+            # The rebuild finished without storing anything (an error or an
+            # uncacheable result), so there is nothing to wait for.
+            break
+    return compute()
+
+
+def _is_success(value):
+    status_code = value[1] if isinstance(value, tuple) else value.status_code
+    return 200 <= status_code < 300
+
+
+def cache_response(ttl_key='properties', cache_key_func=None, tags=None, local=False):
+    """
+    Decorator to cache API responses under tag generations.
+    
+    tags may be a list of tags or a callable taking the view arguments and
+    returning one; it defaults to DEFAULT_TAGS[ttl_key]. DRF responses are
+    stored as (data, status) because they are not rendered yet when the
+    view returns; only successful responses are cached. Rebuilds go through
+    get_or_recompute, so an expiring hot page is rebuilt by one worker.
+    local=True also keeps responses in the per-process L1; use it only for
+    small payloads.
     
     Usage:
         @cache_response(ttl_key='properties')
         def list_properties(request):
             ...
+        
+        @cache_response(ttl_key='property_detail',
+                        tags=lambda request, pk: [property_tag(pk)])
+        def property_detail(request, pk):
+            ...
     """
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             # Generate cache key
             if cache_key_func:
-                cache_key = cache_key_func(request, *args, **kwargs)
+                base_key = cache_key_func(request, *args, **kwargs)
             else:
-                cache_key = f"{view_func.__name__}_{request.path}_{request.GET.urlencode()}"
+                base_key = f"{view_func.__name__}_{request.path}_{request.GET.urlencode()}"
             
-            # Try to get from cache
-            cached_response = cache.get(cache_key)
-            if cached_response is not None:
-                logger.debug(f'Cache HIT: {cache_key}')
-                return cached_response
+            entry_tags = tags(request, *args, **kwargs) if callable(tags) else tags
+            if entry_tags is None:
+                entry_tags = DEFAULT_TAGS.get(ttl_key, ())
+            cache_key = make_tagged_key(base_key, entry_tags)
             
-            # Call view and cache result
-            logger.debug(f'Cache MISS: {cache_key}')
-            response = view_func(request, *args, **kwargs)
+            computed = {}
             
-            ttl = CACHE_TTL.get(ttl_key, 600)
-            cache.set(cache_key, response, ttl)
+            def render():
+                response = view_func(request, *args, **kwargs)
+                computed['response'] = response
+                if isinstance(response, Response):
+                    return (response.data, response.status_code)
+                return response
             
-            return response
+            cached = get_or_recompute(
+                cache_key, render, CACHE_TTL.get(ttl_key, 600), cacheable=_is_success, local=local
+            )
+            if 'response' in computed:
+                logger.debug(f'Cache MISS: {base_key}')
+                return computed['response']
+            
+            logger.debug(f'Cache HIT: {base_key}')
+            if isinstance(cached, tuple):
+                data, status_code = cached
+                return Response(data, status=status_code)
+            return cached
+        
+        return wrapper
+    return decorator
+
+
+def encode_response_variants(content):
+    """Return the identity body plus the gzip/brotli encodings worth storing"""
+    variants = {'identity': content}
+    if len(content) >= RESPONSE_COMPRESSION_MIN_LENGTH:
+        variants['gzip'] = gzip.compress(content, RESPONSE_GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(content, quality=RESPONSE_BROTLI_QUALITY)
+    return variants
+
+
+def choose_content_encoding(request, variants):
+    """Pick the best stored variant the client's Accept-Encoding allows"""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in ('br', 'gzip'):
+        if coding in variants and accepted.get(coding, 0) > 0:
+            return coding
+    return 'identity'
+
+
+def _rendered_response(payload, request):
+    encoding = choose_content_encoding(request, payload['variants'])
+    response = HttpResponse(
+        payload['variants'][encoding], status=payload['status'], content_type=payload['content_type']
+    )
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cache_rendered_response(ttl_key, cache_key_func=None, tags=None, local=False):
+    """
+    Decorator for ViewSet actions that caches the final rendered bytes.
+
+    On a hit the stored JSON (or its gzip/brotli variant, per
+    Accept-Encoding) is returned as a plain HttpResponse, so neither the
+    serializer nor the renderer runs. A miss returns the view's own
+    Response; the body is rendered once more to store it, together with
+    its pre-compressed variants. Only JSON responses are cached, so the
+    browsable API is unaffected. Keys, tags, stampede protection and
+    local (L1) behave as in cache_response.
+
+    Usage:
+        class PropertyViewSet(viewsets.ModelViewSet):
+            @cache_rendered_response('properties', get_properties_cache_key, ['listings'])
+            def list(self, request, *args, **kwargs):
+                return super().list(request, *args, **kwargs)
+    """
+    def decorator(action):
+        @wraps(action)
+        def wrapper(view, request, *args, **kwargs):
+            renderer = getattr(request, 'accepted_renderer', None)
+            if renderer is None or renderer.format != 'json':
+                return action(view, request, *args, **kwargs)
+            
+            if cache_key_func:
+                base_key = cache_key_func(request, *args, **kwargs)
+            else:
+                base_key = f"{action.__name__}_{request.build_absolute_uri()}"
+            # The media type carries renderer options such as indent=.
+            base_key = f'rendered_{base_key}_{request.accepted_media_type}'
+            
+            entry_tags = tags(request, *args, **kwargs) if callable(tags) else tags
+            if entry_tags is None:
+                entry_tags = DEFAULT_TAGS.get(ttl_key, ())
+            cache_key = make_tagged_key(base_key, entry_tags)
+            
+            computed = {}
+            
+            def render():
+                response = action(view, request, *args, **kwargs)
+                computed['response'] = response
+                if not isinstance(response, Response) or not 200 <= response.status_code < 300:
+                    return {'status': response.status_code}
+                context = view.get_renderer_context()
+                context['response'] = response
+                content = renderer.render(response.data, request.accepted_media_type, context)
+                content_type = renderer.media_type
+                if renderer.charset:
+                    content_type = f'{content_type}; charset={renderer.charset}'
+                return {
+                    'status': response.status_code,
+                    'content_type': content_type,
+                    'variants': encode_response_variants(content),
+                }
+            
+            payload = get_or_recompute(
+                cache_key, render, CACHE_TTL.get(ttl_key, 600),
+                cacheable=lambda value: 'variants' in value, local=local
+            )
+            if 'response' in computed:
+                logger.debug(f'Cache MISS: {base_key}')
+                return computed['response']
+            if 'variants' not in payload:
+                # Another worker's rebuild was not cacheable; run the view.
+                return action(view, request, *args, **kwargs)
+            
+            logger.debug(f'Cache HIT: {base_key}')
+            return _rendered_response(payload, request)
         
         return wrapper
     return decorator
@@ -68,22 +677,21 @@ def cache_response(ttl_key='properties', cache_key_func=None):
 
 def get_properties_cache_key(request, *args, **kwargs):
     """Generate cache key for property listings"""
-    page = request.GET.get('page', '1')
-    filters = request.GET.urlencode()
-    return f'properties_page_{page}_{filters}'
+    # The absolute URI covers every filter, cursor and the host used in
+    # pagination links.
+    return f'properties_{request.build_absolute_uri()}'
 
 
 def get_property_detail_cache_key(request, *args, **kwargs):
     """Generate cache key for single property"""
     property_id = kwargs.get('pk')
-    return f'property_detail_{property_id}'
+    # Photo URLs in the payload are absolute, so the host is part of the key.
+    return f'property_detail_{property_id}_{request.get_host()}'
 
 
 def get_reviews_cache_key(request, *args, **kwargs):
     """Generate cache key for reviews"""
-    page = request.GET.get('page', '1')
-    property_id = request.GET.get('property', '')
-    return f'reviews_property_{property_id}_page_{page}'
+    return f'reviews_{request.build_absolute_uri()}'
 
 
 def get_profile_cache_key(request, *args, **kwargs):
@@ -92,35 +700,16 @@ def get_profile_cache_key(request, *args, **kwargs):
     return f'profile_{user_id}'
 
 
-def invalidate_cache(pattern):
-    """
-    Invalidate cache entries matching a pattern.
-    
-    Usage:
-        invalidate_cache('property_*')
-    """
-    # Note: Redis-specific implementation
-    # For other backends, you may need different approaches
-    try:
-        from django_redis import get_redis_connection
-        redis_conn = get_redis_connection('default')
-        
-        # Find all keys matching pattern
-        keys = redis_conn.keys(pattern)
-        if keys:
-            redis_conn.delete(*keys)
-            logger.info(f'Invalidated {len(keys)} cache keys matching {pattern}')
-    except Exception as e:
-        logger.warning(f'Failed to invalidate cache: {e}')
-
-
-def cache_bust_on_change(cache_patterns):
+def cache_bust_on_change(tags):
     """
     Decorator to bust cache when data changes (POST, PUT, PATCH, DELETE).
     
+    Tags may reference URL keyword arguments, e.g. 'property:{pk}'; tags
+    whose placeholders are not available for the request are skipped.
+    
     Usage:
-        @cache_bust_on_change(['property_*', 'properties_*'])
-        def create_property(request):
+        @cache_bust_on_change(['listings', 'property:{pk}'])
+        def update_property(request, pk):
             ...
     """
     def decorator(view_func):
@@ -130,8 +719,13 @@ def cache_bust_on_change(cache_patterns):
             
             # Bust cache on mutations
             if request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
-                for pattern in cache_patterns:
-                    invalidate_cache(pattern)
+                resolved_tags = []
+                for tag in tags:
+                    try:
+                        resolved_tags.append(tag.format(**kwargs))
+                    except (KeyError, IndexError):
+                        continue
+                invalidate_tags(*resolved_tags)
             
             return response
         
@@ -139,57 +733,188 @@ def cache_bust_on_change(cache_patterns):
     return decorator
 
 
+def get_properties_tags(request, *args, **kwargs):
+    """Tags for a listing page; date-filtered pages also follow bookings"""
+    if 'available_from' in request.GET or 'available_to' in request.GET:
+        return ['listings', 'availability']
+    return ['listings']
+
+
+def get_property_detail_tags(request, *args, **kwargs):
+    """Tags for a single property's detail response"""
+    return [property_tag(kwargs.get('pk'))]
+
+
+def get_photos_tags(request, *args, **kwargs):
+    """Tags for a photo list, narrowed to one listing when filtered"""
+    listing_id = request.GET.get('listing')
+    if listing_id:
+        return [property_tag(listing_id)]
+    return ['listings']
+
+
+def get_reviews_tags(request, *args, **kwargs):
+    """Tags for a review list, narrowed to one property when filtered"""
+    property_id = request.GET.get('property') or request.GET.get('reviewed_property')
+    if property_id:
+        return [property_reviews_tag(property_id)]
+    return ['reviews']
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for ViewSets to answer conditional GETs on list and retrieve.
+    
+    Validators come from the cache tags the response depends on
+    (list_cache_tags / detail_cache_tags): the ETag from their generations
+    and Last-Modified from their last invalidation. Model signals bump those
+    tags on every write that can change the payload, including photo,
+    rating and delete changes that leave a row's own timestamp alone, so
+    validating costs no query and no serialization. ETags are weak because
+    the body may be sent gzip or brotli encoded.
+    
+    The cache mixins provide both tag functions; other ViewSets set them as
+    staticmethods. List it before the cache mixins so a 304 skips the cache
+    lookup too:
+        class PropertyViewSet(ConditionalGetMixin, CachedPropertyMixin, viewsets.ModelViewSet):
+            ...
+    """
+    
+    def list(self, request, *args, **kwargs):
+        get_tags = getattr(self, 'list_cache_tags', None)
+        return self.conditional_response(get_tags, super().list, request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        get_tags = getattr(self, 'detail_cache_tags', None)
+        return self.conditional_response(get_tags, super().retrieve, request, *args, **kwargs)
+    
+    def conditional_response(self, get_tags, render, request, *args, **kwargs):
+        if get_tags is None:
+            return render(request, *args, **kwargs)
+        
+        tags = get_tags(request, *args, **kwargs)
+        versions = '.'.join(str(version) for version in get_tag_versions(tags))
+        representation = f'{request.build_absolute_uri()}|{request.accepted_media_type}|{versions}'
+        etag = f'W/"{hashlib.md5(representation.encode("utf-8")).hexdigest()}"'
+        last_modified = int(get_tags_last_changed(tags))
+        
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render(request, *args, **kwargs)
+            if not 200 <= response.status_code < 300:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
 class CachedPropertyMixin:
     """
     Mixin for ViewSets to add caching to list and retrieve actions.
     
+    Responses are cached as rendered bytes (see cache_rendered_response).
+    List pages depend on the 'listings' tag (plus 'availability' when
+    filtered by stay dates) and each detail response on its 'property:<id>'
+    tag; detail bodies are small, so they are also kept in the L1.
+    
     Usage:
         class PropertyViewSet(CachedPropertyMixin, viewsets.ModelViewSet):
             queryset = Property.objects.all()
-            serializer_class = PropertySerializer
+            serializer_class = ListingDataSerializer
     """
     
-    @method_decorator(cache_page(CACHE_TTL['properties']))
+    @cache_rendered_response(
+        ttl_key='properties', cache_key_func=get_properties_cache_key, tags=get_properties_tags
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
-    @method_decorator(cache_page(CACHE_TTL['property_detail']))
+    list_cache_tags = staticmethod(get_properties_tags)
+    
+    @cache_rendered_response(
+        ttl_key='property_detail', cache_key_func=get_property_detail_cache_key, tags=get_property_detail_tags,
+        local=True
+    )
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
+    
+    detail_cache_tags = staticmethod(get_property_detail_tags)
 
 
 class CachedReviewMixin:
     """Mixin for caching review list and detail endpoints"""
     
-    @method_decorator(cache_page(CACHE_TTL['reviews']))
+    @cache_rendered_response(
+        ttl_key='reviews', cache_key_func=get_reviews_cache_key, tags=get_reviews_tags
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
-    @method_decorator(cache_page(CACHE_TTL['reviews']))
+    list_cache_tags = staticmethod(get_reviews_tags)
+    
+    @method_decorator(cache_response(ttl_key='reviews', tags=['reviews']))
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
 
 # Cache warming functions
-def warm_popular_properties_cache():
+# Warmers write through the same locked rebuild path as requests, so a warm
+# run never races a request that is already rebuilding the key. They are
+# scheduled on Celery beat (CELERY_BEAT_SCHEDULE in settings).
+def warm_popular_properties_cache(limit=POPULAR_PROPERTIES_WARM_COUNT):
     """
-    Pre-load cache with popular/frequently accessed properties.
-    Run periodically via Celery task.
+    Make sure the detail pages of the most popular listings are cached.
+
+    Each listing is requested through the real retrieve view, so the warmed
+    entry has exactly the key, tags and rendered bytes the API serves to
+    CACHE_WARMING_HOST. Pages that are already cached are left as they are.
+    Returns the number of listings warmed.
     """
+    from django.test import RequestFactory
+    from django.urls import reverse
     from listings.models import Property
+    from listings.views import ListingManagementViewSet
+    
+    retrieve = ListingManagementViewSet.as_view({'get': 'retrieve'}, throttle_classes=[])
+    factory = RequestFactory()
+    host = getattr(settings, 'CACHE_WARMING_HOST', 'localhost')
+    secure = getattr(settings, 'SECURE_SSL_REDIRECT', False)
     
-    # Get top 10 rated properties
     popular = Property.objects.filter(
         listing_status='available'
-    ).order_by('-listed_on')[:10]
+    ).by_popularity().values_list('pk', flat=True)[:limit]
     
-    for prop in popular:
-        cache_key = f'property_detail_{prop.id}'
-        from listings.serializers import PropertySerializer
-        serialized = PropertySerializer(prop).data
-        cache.set(cache_key, serialized, CACHE_TTL['property_detail'])
+    warmed = 0
+    for property_id in popular:
+        request = factory.get(
+            reverse('property-detail', kwargs={'pk': property_id}),
+            HTTP_HOST=host, HTTP_ACCEPT='application/json', secure=secure
+        )
+        response = retrieve(request, pk=str(property_id))
+        if response.status_code == 200:
+            warmed += 1
     
-    logger.info(f'Warmed cache for {len(popular)} properties')
+    logger.info(f'Warmed cache for {warmed} properties')
+    return warmed
+
+
+def build_homepage_featured():
+    """Serialize the most popular available listings for the homepage"""
+    from listings.models import Property
+    from listings.serializers import ListingDataSerializer
+    
+    properties = Property.objects.filter(
+        listing_status='available'
+    ).with_listing_details().by_popularity()[:HOMEPAGE_FEATURED_COUNT]
+    # No request in the context: photo URLs stay relative, so one cached
+    # copy serves every host.
+    return ListingDataSerializer(properties, many=True).data
+
+
+def get_homepage_featured():
+    """Featured listings for the homepage, rebuilt at most once across workers"""
+    cache_key = make_tagged_key(HOMEPAGE_FEATURED_KEY, ['listings'])
+    return get_or_recompute(cache_key, build_homepage_featured, CACHE_TTL['properties'], local=True)
 
 
 def warm_homepage_cache():
@@ -197,17 +922,8 @@ def warm_homepage_cache():
     Pre-load cache with homepage data.
     Run periodically via Celery task.
     """
-    from listings.models import Property, Review
-    
-    # Cache featured properties
-    cache_key = 'homepage_featured_properties'
-    properties = Property.objects.filter(
-        listing_status='available'
-    ).order_by('-listed_on')[:6]
-    
-    from listings.serializers import PropertySerializer
-    serialized = PropertySerializer(properties, many=True).data
-    cache.set(cache_key, serialized, CACHE_TTL['properties'])
+    cache_key = make_tagged_key(HOMEPAGE_FEATURED_KEY, ['listings'])
+    refresh_cached_value(cache_key, build_homepage_featured, CACHE_TTL['properties'], local=True)
     
     logger.info('Warmed homepage cache')
 
@@ -215,28 +931,30 @@ def warm_homepage_cache():
 # Cache statistics
 def get_cache_stats():
     """Get cache performance statistics"""
+    stats = {'tiers': hot_cache.stats()}
     try:
         from django_redis import get_redis_connection
         redis_conn = get_redis_connection('default')
         
         info = redis_conn.info()
-        return {
+        stats.update({
             'used_memory': info.get('used_memory_human'),
             'connected_clients': info.get('connected_clients'),
             'total_commands': info.get('total_commands_processed'),
             'hits': info.get('keyspace_hits', 0),
             'misses': info.get('keyspace_misses', 0),
             'total_keys': sum(info.get(f'db{i}', {}).get('keys', 0) for i in range(16)),
-        }
+        })
     except Exception as e:
         logger.warning(f'Failed to get cache stats: {e}')
-        return None
+    return stats
 
 
 def clear_all_cache():
     """Clear entire cache (use with caution)"""
     try:
         cache.clear()
+        hot_cache.clear()
         logger.warning('All cache cleared')
     except Exception as e:
         logger.error(f'Failed to clear cache: {e}')
@@ -0,0 +1,125 @@
+"""
+Django management command to benchmark listing search latency.
+
+Generates synthetic listings inside a transaction, then times the first
+results page for the same terms through both search paths:
+- icontains: the three ILIKE '%term%' clauses DRF's SearchFilter emits
+- full-text: the ranked search_vector query used by ListingSearchFilter
+  (PostgreSQL only)
+
+The synthetic rows are rolled back afterwards unless --keep is given.
+
+Usage:
+    python manage.py benchmark_search
+    python manage.py benchmark_search --listings 100000 --runs 50
+"""
+
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from listings.models import LISTING_SEARCH_CONFIG, Property
+
+ADJECTIVES = ['cozy', 'modern', 'rustic', 'spacious', 'charming', 'luxury', 'quiet', 'sunny', 'historic', 'minimalist']
+PLACES = ['apartment', 'cabin', 'loft', 'villa', 'cottage', 'studio', 'townhouse', 'bungalow', 'chalet', 'penthouse']
+CITIES = ['Lisbon', 'Kyoto', 'Denver', 'Cape Town', 'Oslo', 'Austin', 'Hanoi', 'Bristol', 'Quebec', 'Perth']
+FEATURES = ['sea view', 'fireplace', 'hot tub', 'balcony', 'garden', 'workspace', 'rooftop terrace', 'parking', 'pool', 'sauna']
+SEARCH_TERMS = ['cabin', 'Kyoto', 'hot tub', 'luxury villa', 'sea view', 'rustic chalet', 'Cape Town loft', 'sauna']
+
+
+class RollbackBenchmark(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark listing search latency on synthetic listings (icontains vs full-text)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100000, help='Number of synthetic listings')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per search term')
+        parser.add_argument('--page-size', type=int, default=20, help='Results fetched per query')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic listings')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run_benchmark(options)
+                if not options['keep']:
+                    raise RollbackBenchmark
+        except RollbackBenchmark:
+            self.stdout.write(self.style.WARNING('Rolled back synthetic listings'))
+
+    def run_benchmark(self, options):
+        owner, _ = User.objects.get_or_create(username='search_benchmark_host')
+        self.create_listings(owner, options['listings'])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE property_listings')
+
+        self.stdout.write(f"Search latency over {options['listings']} listings, {options['runs']} runs per term:")
+        self.report('icontains', self.time_queries(self.icontains_queryset, options))
+        if connection.vendor == 'postgresql':
+            self.report('full-text', self.time_queries(self.fulltext_queryset, options))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Full-text search requires PostgreSQL (current backend: {connection.vendor})'
+            ))
+
+    def create_listings(self, owner, count, batch_size=5000):
+        rng = random.Random(42)
+        for offset in range(0, count, batch_size):
+            Property.objects.bulk_create([
+                Property(
+                    property_owner=owner,
+                    listing_title=f'{rng.choice(ADJECTIVES).title()} {rng.choice(PLACES)} #{offset + i}',
+                    property_location=f'{rng.randint(1, 999)} {rng.choice(CITIES)}',
+                    nightly_rate=Decimal(rng.randint(40, 900)),
+                    property_description=(
+                        f'{rng.choice(ADJECTIVES).title()} {rng.choice(PLACES)} with '
+                        f'{rng.choice(FEATURES)} and {rng.choice(FEATURES)}.'
+                    ),
+                )
+                for i in range(min(batch_size, count - offset))
+            ])
+        Property.objects.filter(property_owner=owner).refresh_search_vectors()
+        self.stdout.write(self.style.SUCCESS(f'✓ Created {count} synthetic listings'))
+
+    @staticmethod
+    def icontains_queryset(term):
+        return Property.objects.filter(
+            Q(listing_title__icontains=term)
+            | Q(property_description__icontains=term)
+            | Q(property_location__icontains=term)
+        )
+
+    @staticmethod
+    def fulltext_queryset(term):
+        search_query = SearchQuery(term, search_type='websearch', config=LISTING_SEARCH_CONFIG)
+        return Property.objects.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-listed_on')
+
+    @staticmethod
+    def time_queries(build_queryset, options):
+        timings = []
+        for term in SEARCH_TERMS:
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                list(build_queryset(term)[:options['page_size']])
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'  {label:<10} median {statistics.median(timings):8.2f} ms   '
+            f'p95 {p95:8.2f} ms   max {timings[-1]:8.2f} ms'
+        )
@@ -0,0 +1,42 @@
+"""
+Django management command to rebuild listing availability calendars.
+
+Recomputes each listing's PropertyAvailability bitmap from its active
+reservations and re-anchors the rolling horizon at today. Use to backfill
+calendars after migrating, or after bulk changes to reservations that
+bypassed the model signals.
+
+Usage:
+    python manage.py rebuild_availability
+    python manage.py rebuild_availability --property 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from listings.caching import invalidate_tags
+from listings.models import Property, PropertyAvailability
+
+
+class Command(BaseCommand):
+    help = 'Rebuild availability bitmaps for listings from their reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--property',
+            type=int,
+            action='append',
+            dest='property_ids',
+            help='Only rebuild the given property ID (may be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        listing_ids = Property.objects.values_list('pk', flat=True)
+        if options['property_ids']:
+            listing_ids = listing_ids.filter(pk__in=options['property_ids'])
+
+        rebuilt = 0
+        for listing_id in listing_ids.iterator():
+            PropertyAvailability.rebuild_for(listing_id)
+            rebuilt += 1
+        invalidate_tags('availability')
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt availability for {rebuilt} properties'))
@@ -0,0 +1,40 @@
+"""
+Django management command to rebuild the stored rating aggregates on listings.
+
+Recomputes Property.rating_sum, rating_count and rating_average from
+property_reviews in a single bulk UPDATE. Use after bulk imports or raw SQL
+changes to reviews that bypassed the model signals.
+
+Usage:
+    python manage.py rebuild_rating_aggregates
+    python manage.py rebuild_rating_aggregates --property 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from listings.caching import invalidate_tags, property_tag
+from listings.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stored rating aggregates on properties from their reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--property',
+            type=int,
+            action='append',
+            dest='property_ids',
+            help='Only rebuild the given property ID (may be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        properties = Property.objects.all()
+        if options['property_ids']:
+            properties = properties.filter(pk__in=options['property_ids'])
+
+        updated = properties.rebuild_rating_aggregates()
+        # The bulk UPDATE sends no model signals, so expire cached pages here.
+        property_ids = properties.values_list('pk', flat=True)
+        invalidate_tags('listings', *(property_tag(pk) for pk in property_ids.iterator()))
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt rating aggregates for {updated} properties'))
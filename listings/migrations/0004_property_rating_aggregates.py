@@ -0,0 +1,55 @@
+"""
+Denormalized rating aggregates on Property, backfilled from existing reviews.
+
+python manage.py rebuild_rating_aggregates does the same backfill later,
+e.g. after bulk imports that bypass the model signals.
+"""
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    # Same result as PropertyQuerySet.rebuild_rating_aggregates(), in SQL
+    # because the historical Review model predates the current field names.
+    schema_editor.execute(
+        'UPDATE property_listings SET '
+        'rating_sum = COALESCE((SELECT SUM(r.rating_score) FROM property_reviews r '
+        'WHERE r.reviewed_property_id = property_listings.id), 0), '
+        'rating_count = (SELECT COUNT(*) FROM property_reviews r '
+        'WHERE r.reviewed_property_id = property_listings.id), '
+        'rating_average = (SELECT AVG(r.rating_score) FROM property_reviews r '
+        'WHERE r.reviewed_property_id = property_listings.id)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_add_database_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='rating_average',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(
+                fields=['rating_average'],
+                name='property_rating_avg_idx'
+            ),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+"""
+Index-backed booking overlap detection.
+
+Adds a partial index covering active reservations so overlap probes are a
+single index range scan. On PostgreSQL, also adds a daterange exclusion
+constraint so two active reservations can never share a night, even when
+concurrent requests both pass validation.
+"""
+
+from django.db import migrations, models
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'ALTER TABLE property_reservations ADD CONSTRAINT reservation_no_overlap '
+        'EXCLUDE USING gist ('
+        "reserved_property_id WITH =, daterange(arrival_date, departure_date, '[)') WITH &&"
+        ') WHERE ('
+        "reservation_state IN ('awaiting_approval', 'approved') "
+        'AND arrival_date IS NOT NULL AND departure_date IS NOT NULL'
+        ')'
+    )
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE property_reservations DROP CONSTRAINT IF EXISTS reservation_no_overlap'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_property_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(
+                condition=models.Q(reservation_state__in=['awaiting_approval', 'approved']),
+                fields=['reserved_property', 'arrival_date', 'departure_date'],
+                name='reservation_overlap_idx'
+            ),
+        ),
+        migrations.RunPython(add_overlap_constraint, drop_overlap_constraint),
+    ]
@@ -0,0 +1,84 @@
+"""
+Per-listing availability bitmaps and the cancelled reservation state,
+backfilled from existing reservations.
+
+python manage.py rebuild_availability does the same backfill later, e.g.
+to re-anchor every calendar at today.
+"""
+
+from datetime import date, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+HORIZON_NIGHTS = 730
+ACTIVE_STATES = ('awaiting_approval', 'approved')
+
+
+def backfill_availability(apps, schema_editor):
+    # Same bitsets as PropertyAvailability.rebuild_for(); reservations are
+    # read in SQL because the historical Booking model predates the current
+    # field names. Listings without active reservations need no row.
+    PropertyAvailability = apps.get_model('listings', 'PropertyAvailability')
+    horizon_start = date.today()
+    horizon_end = horizon_start + timedelta(days=HORIZON_NIGHTS)
+    bits = {}
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reserved_property_id, arrival_date, departure_date FROM property_reservations '
+            'WHERE reservation_state IN (%s, %s) AND arrival_date < %s AND departure_date > %s',
+            [*ACTIVE_STATES, horizon_end, horizon_start]
+        )
+        for listing_id, arrival, departure in cursor.fetchall():
+            start, end = max(arrival, horizon_start), min(departure, horizon_end)
+            bits[listing_id] = bits.get(listing_id, 0) | (
+                ((1 << (end - start).days) - 1) << (start - horizon_start).days
+            )
+    PropertyAvailability.objects.bulk_create([
+        PropertyAvailability(
+            listing_id=listing_id,
+            horizon_start=horizon_start,
+            booked_nights=booked.to_bytes((HORIZON_NIGHTS + 7) // 8, 'little'),
+        )
+        for listing_id, booked in bits.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_booking_overlap_guard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='reservation_state',
+            field=models.CharField(
+                choices=[
+                    ('awaiting_approval', 'Awaiting Approval'),
+                    ('approved', 'Approved'),
+                    ('rejected', 'Rejected'),
+                    ('completed', 'Completed'),
+                    ('cancelled', 'Cancelled'),
+                ],
+                default='awaiting_approval',
+                max_length=25
+            ),
+        ),
+        migrations.CreateModel(
+            name='PropertyAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horizon_start', models.DateField()),
+                ('booked_nights', models.BinaryField(default=bytes)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='listings.property')),
+            ],
+            options={
+                'verbose_name_plural': 'Property Availability',
+                'db_table': 'property_availability',
+            },
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
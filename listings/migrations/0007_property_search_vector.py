@@ -0,0 +1,46 @@
+"""
+Weighted full-text search vector for listings.
+
+Adds Property.search_vector. On PostgreSQL, also backfills it for existing
+rows and builds the GIN index used by listings.search.ListingSearchFilter.
+"""
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def build_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'UPDATE property_listings SET search_vector = '
+        "setweight(to_tsvector('english', coalesce(listing_title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(property_location, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(property_description, '')), 'C')"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS property_search_vector_idx '
+        'ON property_listings USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS property_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_property_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
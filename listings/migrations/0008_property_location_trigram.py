@@ -0,0 +1,42 @@
+"""
+Trigram indexes on property_location.
+
+PostgreSQL only. The expression index matches the UPPER(...::text) LIKE form
+Django emits for icontains/istartswith, so the ?location= filter and
+autocomplete prefix lookups stop scanning the table. The plain column index
+serves word-similarity (%>) fuzzy matches.
+"""
+
+from django.db import migrations
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS property_location_upper_trgm_idx '
+        'ON property_listings USING gin ((UPPER(property_location::text)) gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS property_location_trgm_idx '
+        'ON property_listings USING gin (property_location gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS property_location_upper_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS property_location_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_property_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,37 @@
+"""
+Composite indexes matching the KeysetPagination cursor orderings.
+
+Each covers the model's Meta.ordering column plus the id tiebreaker in the
+same direction, so a cursor page is an index range scan that stops after
+page_size rows instead of sorting the table. In SQL because the historical
+models predate the current field names.
+"""
+
+from django.db import migrations
+
+KEYSET_INDEXES = [
+    ('property_listed_keyset_idx', 'property_listings', 'listed_on'),
+    ('reservation_booked_keyset_idx', 'property_reservations', 'booked_on'),
+    ('review_submitted_keyset_idx', 'property_reviews', 'submitted_at'),
+]
+
+
+def add_keyset_indexes(apps, schema_editor):
+    for name, table, column in KEYSET_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column} DESC, id DESC)')
+
+
+def drop_keyset_indexes(apps, schema_editor):
+    for name, table, column in KEYSET_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_property_location_trigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_keyset_indexes, drop_keyset_indexes),
+    ]
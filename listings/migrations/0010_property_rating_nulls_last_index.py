@@ -0,0 +1,35 @@
+"""
+Index for "top rated" listing pages (?ordering=-rating_average).
+
+NullsLastOrderingFilter sorts unrated listings last, which on PostgreSQL a
+plain rating_average index only serves in ascending order. PostgreSQL only;
+SQLite does not accept NULLS LAST in an index definition.
+"""
+
+from django.db import migrations
+
+
+def add_rating_desc_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS property_rating_avg_desc_idx '
+        'ON property_listings (rating_average DESC NULLS LAST)'
+    )
+
+
+def drop_rating_desc_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS property_rating_avg_desc_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_rating_desc_index, drop_rating_desc_index),
+    ]
@@ -0,0 +1,37 @@
+"""
+Ordered prefix index on property_location for location autocomplete.
+
+PostgreSQL only. The trigram GIN indexes from 0008 find istartswith matches
+but return them unordered, so short prefixes read every match. This btree on
+the same UPPER(property_location::text) expression, with text_pattern_ops so
+LIKE 'PREFIX%' becomes a range scan, lets LocationAutocomplete stop after
+its capped candidate rows.
+"""
+
+from django.db import migrations
+
+
+def add_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS property_location_upper_prefix_idx '
+        'ON property_listings ((UPPER(property_location::text)) text_pattern_ops)'
+    )
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS property_location_upper_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_property_rating_nulls_last_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_index, drop_prefix_index),
+    ]
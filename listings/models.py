@@ -6,13 +6,24 @@ property listings, reservation system, payment processing, and user reviews.
 """
 
 from decimal import Decimal
-from datetime import date
-from django.db import models
+from datetime import date, timedelta
+from django.db import IntegrityError, NotSupportedError, connections, models, transaction
+from django.db.models import Avg, Case, Count, Exists, F, FloatField, Func, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+
+from airbnb.metrics import ACTIVE_BOOKING_GAUGE_STATES, adjust_business_gauge
+
+from .caching import invalidate_tags_on_commit, property_reviews_tag, property_tag
+
+# Text search configuration used for listing search vectors and queries.
+LISTING_SEARCH_CONFIG = 'english'
 
 
 class UserProfile(models.Model):
@@ -57,6 +68,151 @@ def auto_generate_profile_instance(sender, instance, created, **kwargs):
             pass
 
 
+class BookedNightsIn(Func):
+    """
+    Whether a PropertyAvailability bitset has a booked night in [start, end).
+
+    PostgreSQL only: get_bit() numbers bytea bits from the least significant
+    bit of the first byte, matching the little-endian layout of booked_nights.
+    """
+    output_field = models.BooleanField()
+
+    def __init__(self, start, end):
+        super().__init__(
+            F('booked_nights'), F('horizon_start'),
+            Value(start, output_field=models.DateField()), Value(end, output_field=models.DateField()),
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError('BookedNightsIn is only supported on PostgreSQL.')
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        (bits, bits_params), (horizon, horizon_params), (start, start_params), (end, end_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        sql = (
+            f'EXISTS (SELECT 1 FROM generate_series({start} - {horizon}, {end} - {horizon} - 1) AS night '
+            f'WHERE night < length({bits}) * 8 AND get_bit({bits}, night) = 1)'
+        )
+        return sql, (*start_params, *horizon_params, *end_params, *horizon_params, *bits_params, *bits_params)
+
+
+class PropertyQuerySet(models.QuerySet):
+    POPULARITY_BOOKING_WEIGHT = 3
+    POPULARITY_SAVE_WEIGHT = 2
+
+    def by_popularity(self, window_days=30):
+        """
+        Order listings by recent demand, most popular first.
+
+        Scores reservations made in the last window_days (excluding rejected
+        and cancelled ones) above wishlist saves, and both above the stored
+        review count. Each signal is one correlated COUNT subquery.
+        """
+        since = timezone.now() - timedelta(days=window_days)
+        recent_bookings = Booking.objects.filter(
+            reserved_property=OuterRef('pk'),
+            booked_on__gte=since,
+        ).exclude(
+            reservation_state__in=('rejected', 'cancelled'),
+        ).order_by().values('reserved_property').annotate(total=Count('pk')).values('total')
+        saves = Wishlist.saved_properties.through.objects.filter(
+            property_id=OuterRef('pk'),
+        ).order_by().values('property_id').annotate(total=Count('pk')).values('total')
+
+        return self.annotate(
+            recent_bookings=Coalesce(Subquery(recent_bookings), 0),
+            wishlist_saves=Coalesce(Subquery(saves), 0),
+        ).annotate(
+            popularity=(
+                F('recent_bookings') * self.POPULARITY_BOOKING_WEIGHT
+                + F('wishlist_saves') * self.POPULARITY_SAVE_WEIGHT
+                + F('rating_count')
+            ),
+        ).order_by('-popularity', '-listed_on')
+
+    def with_listing_details(self):
+        """
+        Load everything ListingDataSerializer renders in a constant number of queries.
+
+        Owner usernames are joined and photos are prefetched in one batch;
+        review stats come from the stored rating aggregates.
+        """
+        return self.select_related('property_owner').prefetch_related('images')
+
+    def apply_rating_change(self, score_delta, count_delta):
+        """
+        Shift the stored rating aggregates by a review delta in a single UPDATE.
+
+        The average is derived from the post-update sum and count inside the
+        same statement, so concurrent review writes never lose an increment.
+        """
+        new_sum = F('rating_sum') + score_delta
+        new_count = F('rating_count') + count_delta
+        return self.update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating_average=Case(
+                When(rating_count__lte=-count_delta, then=Value(None)),
+                default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+                output_field=FloatField(),
+            ),
+        )
+
+    def available_between(self, start, end):
+        """
+        Exclude listings with a booked night in [start, end).
+
+        On PostgreSQL the window's bits are tested inside the query against
+        the PropertyAvailability bitmaps, so only the rows actually fetched
+        (e.g. one page) are checked; listings whose calendar does not cover
+        the window, or that have none, fall back to an indexed bookings
+        probe. Other backends use the bookings probe alone.
+        """
+        overlapping_booking = Exists(Booking.objects.filter(
+            reserved_property=OuterRef('pk'),
+            reservation_state__in=Booking.ACTIVE_STATES,
+            arrival_date__lt=end,
+            departure_date__gt=start,
+        ))
+        if connections[self.db].vendor != 'postgresql':
+            return self.exclude(overlapping_booking)
+        covering_calendar = PropertyAvailability.objects.filter(
+            listing=OuterRef('pk'),
+            horizon_start__lte=start,
+            horizon_start__gte=end - timedelta(days=PropertyAvailability.HORIZON_NIGHTS),
+        )
+        return self.exclude(
+            Exists(covering_calendar.filter(BookedNightsIn(start, end)))
+        ).exclude(
+            ~Exists(covering_calendar) & overlapping_booking
+        )
+
+    def refresh_search_vectors(self):
+        """
+        Recompute the weighted search_vector (title > location > description).
+
+        PostgreSQL only; other backends keep a NULL vector and search through
+        the icontains fallback in listings.search.ListingSearchFilter.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        return self.update(search_vector=(
+            SearchVector('listing_title', weight='A', config=LISTING_SEARCH_CONFIG)
+            + SearchVector('property_location', weight='B', config=LISTING_SEARCH_CONFIG)
+            + SearchVector('property_description', weight='C', config=LISTING_SEARCH_CONFIG)
+        ))
+
+    def rebuild_rating_aggregates(self):
+        """Recompute the stored rating aggregates from property_reviews in bulk."""
+        reviews = Review.objects.filter(reviewed_property=OuterRef('pk')).order_by().values('reviewed_property')
+        return self.update(
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating_score')).values('total')), 0),
+            rating_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+            rating_average=Subquery(reviews.annotate(average=Avg('rating_score')).values('average')),
+        )
+
+
 class Property(models.Model):
     AVAILABILITY_STATUS = (
         ('available', 'Ready to Book'),
@@ -76,6 +232,12 @@ class Property(models.Model):
     listing_status = models.CharField(max_length=20, choices=AVAILABILITY_STATUS, default='available')
     listed_on = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(null=True, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PropertyQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.listing_title} - {self.property_location}"
@@ -87,6 +249,26 @@ class Property(models.Model):
         verbose_name_plural = "Properties"
         ordering = ['-listed_on']
         db_table = 'property_listings'
+        indexes = [
+            models.Index(fields=['rating_average'], name='property_rating_avg_idx'),
+        ]
+
+
+@receiver(post_save, sender=Property)
+def refresh_property_search_vector(sender, instance, update_fields=None, **kwargs):
+    searchable_fields = {'listing_title', 'property_location', 'property_description'}
+    if update_fields is not None and not searchable_fields & set(update_fields):
+        return
+    Property.objects.filter(pk=instance.pk).refresh_search_vectors()
+
+
+@receiver([post_save, post_delete], sender=Property)
+def invalidate_property_cache(sender, instance, using, **kwargs):
+    # Review payloads embed the listing title, so their pages go too.
+    invalidate_tags_on_commit(
+        'listings', property_tag(instance.pk), 'reviews', property_reviews_tag(instance.pk),
+        using=using
+    )
 
 
 class PropertyImage(models.Model):
@@ -98,6 +280,7 @@ class PropertyImage(models.Model):
     def __str__(self):
         primary_text = "Primary" if self.set_as_primary else "Secondary"
         return f"{primary_text} photo for {self.listing.listing_title}"
+
     
     class Meta:
         ordering = ['-set_as_primary', '-uploaded_at']
@@ -118,13 +301,23 @@ class PropertyImage(models.Model):
         super().save(*args, **kwargs)
 
 
+@receiver([post_save, post_delete], sender=PropertyImage)
+def invalidate_property_image_cache(sender, instance, using, **kwargs):
+    invalidate_tags_on_commit('listings', property_tag(instance.listing_id), using=using)
+
+
 class Booking(models.Model):
     RESERVATION_STATES = (
         ('awaiting_approval', 'Awaiting Approval'),
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
         ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
     )
+    # States that hold the property's nights; mirrored by the
+    # reservation_overlap_idx index and the PostgreSQL exclusion constraint.
+    ACTIVE_STATES = ('awaiting_approval', 'approved')
+    OVERLAP_CONSTRAINT = 'reservation_no_overlap'
 
     guest = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservations')
     reserved_property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='reservations')
@@ -140,6 +333,31 @@ class Booking(models.Model):
     class Meta:
         ordering = ['-booked_on']
         db_table = 'property_reservations'
+        indexes = [
+            models.Index(
+                fields=['reserved_property', 'arrival_date', 'departure_date'],
+                condition=Q(reservation_state__in=['awaiting_approval', 'approved']),
+                name='reservation_overlap_idx',
+            ),
+        ]
+    
+    @classmethod
+    def find_overlapping(cls, reserved_property, arrival_date, departure_date, exclude_pk=None):
+        """
+        Return the first active reservation sharing a night with [arrival_date, departure_date).
+
+        A single probe on reservation_overlap_idx; shared by Booking.clean()
+        and ReservationDataSerializer.validate().
+        """
+        conflicts = cls.objects.filter(
+            reserved_property=reserved_property,
+            reservation_state__in=cls.ACTIVE_STATES,
+            arrival_date__lt=departure_date,
+            departure_date__gt=arrival_date,
+        )
+        if exclude_pk is not None:
+            conflicts = conflicts.exclude(pk=exclude_pk)
+        return conflicts.order_by('arrival_date').first()
     
     def clean(self):
         if self.departure_date and self.arrival_date:
@@ -159,21 +377,26 @@ class Booking(models.Model):
                     'departure_date': 'Maximum reservation duration is 365 nights'
                 })
             
-            overlapping = Booking.objects.filter(
-                reserved_property=self.reserved_property,
-                reservation_state__in=['awaiting_approval', 'approved']
-            ).exclude(pk=self.pk)
-            
-            for existing_reservation in overlapping:
-                if not (self.departure_date <= existing_reservation.arrival_date or 
-                        self.arrival_date >= existing_reservation.departure_date):
-                    raise ValidationError({
-                        'arrival_date': 'Selected dates conflict with existing reservation'
-                    })
+            if self.reservation_state in self.ACTIVE_STATES and Booking.find_overlapping(
+                self.reserved_property_id, self.arrival_date, self.departure_date, exclude_pk=self.pk
+            ):
+                raise ValidationError({
+                    'arrival_date': 'Selected dates conflict with existing reservation'
+                })
     
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as exc:
+            # A concurrent request won the race between clean() and the
+            # insert; the exclusion constraint rejected the second booking.
+            if self.OVERLAP_CONSTRAINT in str(exc):
+                raise ValidationError({
+                    'arrival_date': 'Selected dates conflict with existing reservation'
+                })
+            raise
     
     @property
     def duration_nights(self):
@@ -186,6 +409,163 @@ class Booking(models.Model):
         return self.reserved_property.calculate_booking_cost(self.duration_nights)
 
 
+class PropertyAvailability(models.Model):
+    """
+    Booked nights for one listing over a rolling horizon, stored as a bitset.
+
+    Bit i of booked_nights is set when night horizon_start + i is held by an
+    active reservation. Two years fit in 92 bytes, so availability searches
+    and calendars never need to touch property_reservations.
+    """
+    HORIZON_NIGHTS = 730
+
+    listing = models.OneToOneField(Property, on_delete=models.CASCADE, related_name='availability')
+    horizon_start = models.DateField()
+    booked_nights = models.BinaryField(default=bytes)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Availability for listing #{self.listing_id} from {self.horizon_start}"
+
+    class Meta:
+        verbose_name_plural = "Property Availability"
+        db_table = 'property_availability'
+
+    @property
+    def horizon_end(self):
+        return self.horizon_start + timedelta(days=self.HORIZON_NIGHTS)
+
+    @staticmethod
+    def night_mask(horizon_start, start, end):
+        return ((1 << (end - start).days) - 1) << (start - horizon_start).days
+
+    def covers(self, start, end):
+        return self.horizon_start <= start and end <= self.horizon_end
+
+    def booked_bits(self):
+        return int.from_bytes(bytes(self.booked_nights), 'little')
+
+    def is_free(self, start, end):
+        return not self.booked_bits() & self.night_mask(self.horizon_start, start, end)
+
+    def is_booked(self, night):
+        """True/False for a night inside the horizon, None outside it."""
+        if not self.covers(night, night + timedelta(days=1)):
+            return None
+        return bool(self.booked_bits() >> (night - self.horizon_start).days & 1)
+
+    @classmethod
+    def rebuild_for(cls, listing_id, create=True):
+        """
+        Recompute a listing's bitset from its active reservations, re-anchored at today.
+
+        The calendar row is locked first so concurrent booking writes for the
+        same listing rebuild one after another, each seeing the other's rows.
+        """
+        with transaction.atomic():
+            if create:
+                cls.objects.get_or_create(listing_id=listing_id, defaults={'horizon_start': date.today()})
+            availability = cls.objects.select_for_update().filter(listing_id=listing_id).first()
+            if availability is None:
+                return None
+
+            availability.horizon_start = date.today()
+            horizon_end = availability.horizon_end
+            bits = 0
+            reservations = Booking.objects.filter(
+                reserved_property_id=listing_id,
+                reservation_state__in=Booking.ACTIVE_STATES,
+                arrival_date__lt=horizon_end,
+                departure_date__gt=availability.horizon_start,
+            ).values_list('arrival_date', 'departure_date')
+            for arrival, departure in reservations:
+                bits |= cls.night_mask(
+                    availability.horizon_start,
+                    max(arrival, availability.horizon_start),
+                    min(departure, horizon_end)
+                )
+            availability.booked_nights = bits.to_bytes((cls.HORIZON_NIGHTS + 7) // 8, 'little')
+            availability.save()
+            return availability
+
+
+@receiver(pre_save, sender=Booking)
+def capture_previous_reserved_property(sender, instance, **kwargs):
+    instance._previous_property_id = instance._previous_reservation_state = None
+    if instance.pk:
+        previous = Booking.objects.filter(pk=instance.pk).values_list(
+            'reserved_property_id', 'reservation_state'
+        ).first()
+        if previous:
+            instance._previous_property_id, instance._previous_reservation_state = previous
+
+
+@receiver(post_save, sender=Booking)
+def sync_availability_on_booking_save(sender, instance, update_fields=None, **kwargs):
+    tracked_fields = {'reserved_property', 'arrival_date', 'departure_date', 'reservation_state'}
+    if update_fields is not None and not tracked_fields & set(update_fields):
+        return
+    PropertyAvailability.rebuild_for(instance.reserved_property_id)
+    previous_property_id = getattr(instance, '_previous_property_id', None)
+    if previous_property_id and previous_property_id != instance.reserved_property_id:
+        PropertyAvailability.rebuild_for(previous_property_id, create=False)
+
+
+@receiver(post_delete, sender=Booking)
+def sync_availability_on_booking_delete(sender, instance, **kwargs):
+    # Never create a calendar row here: the listing itself may be mid-delete.
+    PropertyAvailability.rebuild_for(instance.reserved_property_id, create=False)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_availability_cache(sender, instance, using, update_fields=None, **kwargs):
+    tracked_fields = {'reserved_property', 'arrival_date', 'departure_date', 'reservation_state'}
+    if update_fields is not None and not tracked_fields & set(update_fields):
+        return
+    invalidate_tags_on_commit('availability', using=using)
+
+
+# Business gauges on /metrics/ (see airbnb.metrics.ApplicationMetricsCollector)
+ROW_COUNT_GAUGES = {
+    User: 'airbnb_users_total',
+    Property: 'airbnb_properties_total',
+    Booking: 'airbnb_bookings_total',
+}
+
+
+def _adjust_gauge_on_commit(name, delta, using):
+    transaction.on_commit(lambda: adjust_business_gauge(name, delta), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Property)
+@receiver(post_save, sender=Booking)
+def count_created_row(sender, instance, created, using, **kwargs):
+    if created:
+        _adjust_gauge_on_commit(ROW_COUNT_GAUGES[sender], 1, using)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Property)
+@receiver(post_delete, sender=Booking)
+def count_deleted_row(sender, instance, using, **kwargs):
+    _adjust_gauge_on_commit(ROW_COUNT_GAUGES[sender], -1, using)
+
+
+@receiver(post_save, sender=Booking)
+def count_active_booking_change(sender, instance, using, **kwargs):
+    was_active = getattr(instance, '_previous_reservation_state', None) in ACTIVE_BOOKING_GAUGE_STATES
+    is_active = instance.reservation_state in ACTIVE_BOOKING_GAUGE_STATES
+    if is_active != was_active:
+        _adjust_gauge_on_commit('airbnb_active_bookings_total', 1 if is_active else -1, using)
+
+
+@receiver(post_delete, sender=Booking)
+def count_deleted_active_booking(sender, instance, using, **kwargs):
+    if instance.reservation_state in ACTIVE_BOOKING_GAUGE_STATES:
+        _adjust_gauge_on_commit('airbnb_active_bookings_total', -1, using)
+
+
 class Payment(models.Model):
     TRANSACTION_STATES = (
         ('processing', 'Processing'),
@@ -228,6 +608,75 @@ class Review(models.Model):
         ordering = ['-submitted_at']
         unique_together = ['reviewer', 'associated_booking']
         db_table = 'property_reviews'
+    
+    def save(self, *args, **kwargs):
+        # Keep the review row and its property's rating aggregates in step.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+@receiver(pre_save, sender=Review)
+def capture_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list(
+            'reviewed_property_id', 'rating_score'
+        ).first()
+
+
+@receiver(post_save, sender=Review)
+def apply_review_to_rating_aggregates(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        previous_property_id, previous_score = previous
+        if previous_property_id == instance.reviewed_property_id:
+            if instance.rating_score != previous_score:
+                Property.objects.filter(pk=instance.reviewed_property_id).apply_rating_change(
+                    instance.rating_score - previous_score, 0
+                )
+            return
+        Property.objects.filter(pk=previous_property_id).apply_rating_change(-previous_score, -1)
+    Property.objects.filter(pk=instance.reviewed_property_id).apply_rating_change(instance.rating_score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_rating_aggregates(sender, instance, **kwargs):
+    Property.objects.filter(pk=instance.reviewed_property_id).apply_rating_change(-instance.rating_score, -1)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_cache(sender, instance, using, **kwargs):
+    # Listing payloads carry the rating aggregates the review just changed.
+    property_ids = {instance.reviewed_property_id}
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        property_ids.add(previous[0])
+    tags = ['reviews', 'listings']
+    for property_id in property_ids:
+        tags.extend([property_tag(property_id), property_reviews_tag(property_id)])
+    invalidate_tags_on_commit(*tags, using=using)
+
+
+@receiver(pre_save, sender=User)
+def capture_previous_username(sender, instance, update_fields=None, **kwargs):
+    instance._previous_username = None
+    # Logins save only last_login; skip the lookup for such partial saves.
+    if instance.pk and (update_fields is None or 'username' in update_fields):
+        instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_username_cache(sender, instance, created, using, **kwargs):
+    # Listing and review payloads embed owner_username / reviewer_username.
+    previous = getattr(instance, '_previous_username', None)
+    if created or previous is None or previous == instance.username:
+        return
+    owned_ids = Property.objects.using(using).filter(property_owner=instance).values_list('pk', flat=True)
+    reviewed_ids = Review.objects.using(using).filter(reviewer=instance).values_list('reviewed_property_id', flat=True)
+    tags = ['listings', 'reviews']
+    tags.extend(property_tag(property_id) for property_id in owned_ids)
+    tags.extend(property_reviews_tag(property_id) for property_id in set(reviewed_ids))
+    invalidate_tags_on_commit(*tags, using=using)
 
 
 class Wishlist(models.Model):
@@ -0,0 +1,211 @@
+"""
+Pagination classes for list endpoints.
+
+KeysetPagination pages through a model's default ordering field with an id
+tiebreaker (e.g. listed_on, id). Migration 0009 indexes each such pair, so
+every page is a single index range scan with no COUNT(*) and no OFFSET.
+Deep pages cost the same as the first one.
+
+ApproximateCountPagination keeps page numbers but takes the total from the
+PostgreSQL planner for large result sets instead of an exact COUNT(*).
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_row_count(queryset):
+    """
+    Planner estimate of the rows a queryset returns, or None if unavailable.
+
+    Unfiltered querysets read pg_class.reltuples; filtered ones run EXPLAIN
+    and take the top plan node's row estimate. Neither scans the table.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    query = queryset.order_by().query
+    with connection.cursor() as cursor:
+        if not query.where and not query.distinct:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            # reltuples is -1 until the table has been vacuumed/analyzed.
+            return int(row[0]) if row and row[0] >= 0 else None
+
+        sql, params = query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApproximateCountPaginator(DjangoPaginator):
+    """Paginator whose count is a planner estimate above exact_threshold."""
+
+    def __init__(self, *args, exact_threshold, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact_threshold = exact_threshold
+        self.count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_row_count(self.object_list) if hasattr(self.object_list, 'query') else None
+        if estimate is None or estimate < self.exact_threshold:
+            return super().count
+        self.count_is_approximate = True
+        return estimate
+
+
+class ApproximateCountPagination(PageNumberPagination):
+    """
+    Page-number pagination that avoids COUNT(*) over large result sets.
+
+    Totals below PAGINATION_EXACT_COUNT_THRESHOLD are counted exactly; above
+    it the planner estimate is returned and count_is_approximate is true. An
+    estimate can be off in either direction, so the last page may be short
+    or empty. Non-PostgreSQL databases always count exactly.
+    """
+
+    def django_paginator_class(self, object_list, per_page, **kwargs):
+        return ApproximateCountPaginator(
+            object_list, per_page,
+            exact_threshold=getattr(settings, 'PAGINATION_EXACT_COUNT_THRESHOLD', 10000),
+            **kwargs
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_approximate', self.page.paginator.count_is_approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the model's Meta.ordering field plus id.
+
+    Property pages on (-listed_on, -id), Booking on (-booked_on, -id) and
+    Review on (-submitted_at, -id), each backed by a matching composite
+    index. The cursor encodes the boundary row's (value, id), so the next
+    page is `WHERE (value, id) < (v, i)`.
+
+    Requests that ask for page numbers (?page=) or a different result order
+    (?ordering=, ?search=) are served by fallback_class instead.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    fallback_class = ApproximateCountPagination
+    fallback_query_params = ('page', 'ordering', 'search')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        if any(param in request.query_params for param in self.fallback_query_params):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.key_field, self.descending = self.get_key(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        # Walk backwards for "previous" pages by flipping the comparison and
+        # the sort direction, then restore display order below.
+        walk_descending = self.descending != reverse
+        if position is not None:
+            value, pk = position
+            before = '__lt' if walk_descending else '__gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.key_field}{before}': value})
+                | Q(**{self.key_field: value, f'pk{before}': pk})
+            )
+        prefix = '-' if walk_descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.key_field}', f'{prefix}pk')
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_key(self, queryset):
+        ordering = queryset.model._meta.ordering
+        key = ordering[0] if ordering else 'pk'
+        return key.lstrip('-'), key.startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            raw_value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            value = self.model._meta.get_field(self.key_field).to_python(raw_value)
+            return (value, int(pk)), bool(reverse)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.key_field)
+        raw_value = value.isoformat() if hasattr(value, 'isoformat') else value
+        payload = json.dumps([raw_value, instance.pk, int(reverse)], separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.fallback:
+            return self.fallback.get_next_link()
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.fallback:
+            return self.fallback.get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.fallback:
+            return self.fallback.to_html()
+        return super().to_html()
@@ -1,153 +1,623 @@
 """
 Rate limiting and throttling configuration for API endpoints.
+
+ThrottleEngine makes one throttling decision per request for both
+RateLimitMiddleware and the DRF throttle classes. Limits are counted by
+SlidingWindowLimiter: a sliding window approximated from two fixed
+windows, where the previous window's count is weighted by how much of it
+the sliding window still covers. On Redis all of a request's rules are
+checked by a single Lua script call, so the read, the limit test and the
+increment are atomic across every worker and host. LocalTokenBucket sits
+in front of it so that each process only talks to Redis once per batch of
+leased tokens, and not at all for clients it already knows are blocked.
 """
 
+from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.http import JsonResponse
-from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle, AnonRateThrottle
+from rest_framework.throttling import SimpleRateThrottle
 import logging
+import math
+import threading
+import time
+
+from airbnb.metrics import RATE_LIMIT_DECISIONS
+
+from .caching import LocalLRUCache
 
 logger = logging.getLogger(__name__)
 
+RATE_LIMIT_WINDOW = 3600  # seconds; rate limit rules are requests per hour
+
+# KEYS: one counter hash per rule. ARGV: limit, window seconds and requested
+# tokens for each key, in order. Every key is checked before any is
+# written, and nothing is counted unless all of them fit. Returns a flat
+# {granted, retry_after seconds} pair per key; the windows are taken from
+# the Redis server clock, so hosts never disagree about which is current.
+SLIDING_WINDOW_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local now = redis.call('TIME')
+local t = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local results, updates = {}, {}
+local rejected = false
+
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 3 - 2])
+    local size = tonumber(ARGV[i * 3 - 1])
+    local requested = tonumber(ARGV[i * 3])
+    local window = math.floor(t / size)
+    local into = t - window * size
+
+    local state = redis.call('HMGET', key, 'window', 'current', 'previous')
+    local stored = tonumber(state[1])
+    local current = tonumber(state[2]) or 0
+    local previous = tonumber(state[3]) or 0
+    if stored ~= window then
+        if stored == window - 1 then previous = current else previous = 0 end
+        current = 0
+    end
+
+    local granted = math.min(requested, math.floor(limit - previous * (1 - into / size) - current))
+    if granted < 1 then
+        local wait
+        local spare = limit - 1 - current
+        if previous > 0 and spare >= 0 then
+            wait = (1 - spare / previous) * size - into
+        else
+            wait = size - into
+            if current > 0 then wait = wait + math.max(0, 1 - (limit - 1) / current) * size end
+        end
+        rejected = true
+        table.insert(results, 0)
+        table.insert(results, math.ceil(wait))
+    else
+        updates[i] = {window, current + granted, previous, size}
+        table.insert(results, granted)
+        table.insert(results, 0)
+    end
+end
+
+if not rejected then
+    for i, key in ipairs(KEYS) do
+        local u = updates[i]
+        redis.call('HSET', key, 'window', u[1], 'current', u[2], 'previous', u[3])
+        redis.call('EXPIRE', key, u[4] * 2)
+    end
+end
+return results
+"""
+
+# KEYS: one counter hash. ARGV: tokens to give back and the window index
+# they were taken in. The tokens come off whichever of current/previous
+# that window now is; older windows no longer count, so there is nothing
+# to give back.
+REFUND_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local stored = tonumber(state[1])
+local taken_in = tonumber(ARGV[2])
+local field
+if stored == taken_in then field = 'current' elseif stored == taken_in + 1 then field = 'previous' end
+if field then
+    local value = tonumber(state[field == 'current' and 2 or 3]) or 0
+    redis.call('HSET', KEYS[1], field, math.max(0, value - tonumber(ARGV[1])))
+end
+return 0
+"""
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window request limiter shared by all workers and hosts.
+
+    hit_many() takes tokens for several (key, limit, window, cost) rules at
+    once and returns a (granted, retry_after) pair per rule. Each rule is
+    granted up to cost tokens, but if any rule cannot fit even one request
+    nothing is counted and every pair reports granted 0. On Redis the check
+    runs as SLIDING_WINDOW_SCRIPT in one round trip; other cache backends
+    use atomic cache.incr on per-window keys. If the cache is unreachable
+    the limiter fails open rather than taking the API down with it.
+    """
+
+    def __init__(self):
+        self._script = None
+        self._refund_script = None
+
+    def hit(self, key, limit, window=RATE_LIMIT_WINDOW, cost=1):
+        return self.hit_many([(key, limit, window, cost)])[0]
+
+    def hit_many(self, rules):
+        try:
+            script = self._get_script()
+            if script is not None:
+                args = [value for _, limit, window, cost in rules for value in (limit, window, cost)]
+                flat = script(keys=[cache.make_key(key) for key, *_ in rules], args=args)
+                results = [(int(granted), int(retry_after)) for granted, retry_after in zip(flat[::2], flat[1::2])]
+            else:
+                results = self._hit_many_with_cache(rules)
+        except Exception as e:
+            logger.warning(f'Rate limiter unavailable, allowing request: {e}')
+            return [(cost, 0) for *_, cost in rules]
+        if all(granted for granted, _ in results):
+            return results
+        return [(0, retry_after) for _, retry_after in results]
 
-class CustomUserRateThrottle(UserRateThrottle):
+    def refund(self, key, window, tokens, taken_at):
+        """Give back tokens taken for key at Unix time taken_at but never spent"""
+        index = int(taken_at // window)
+        try:
+            if self._get_script() is not None:
+                self._refund_script(keys=[cache.make_key(key)], args=[tokens, index])
+                return
+            try:
+                cache.decr(f'{key}:{index}', tokens)
+            except ValueError:
+                pass  # That window's counter has already expired.
+        except Exception as e:
+            logger.warning(f'Failed to refund rate limit tokens for {key}: {e}')
+
+    def _get_script(self):
+        if self._script is None:
+            try:
+                from django_redis import get_redis_connection
+                connection = get_redis_connection('default')
+                self._script = connection.register_script(SLIDING_WINDOW_SCRIPT)
+                self._refund_script = connection.register_script(REFUND_SCRIPT)
+            except (ImportError, NotImplementedError):
+                self._script = False
+        return self._script or None
+
+    def _hit_many_with_cache(self, rules):
+        results = [self._hit_with_cache(*rule) for rule in rules]
+        if not all(granted for granted, _ in results):
+            # Give back what the rules that did fit took.
+            for (key, limit, window, cost), (granted, _) in zip(rules, results):
+                if granted:
+                    cache.decr(f'{key}:{int(time.time() // window)}', granted)
+        return results
+
+    def _hit_with_cache(self, key, limit, window, cost):
+        now = time.time()
+        index = int(now // window)
+        into = now - index * window
+        current_key = f'{key}:{index}'
+
+        previous = cache.get(f'{key}:{index - 1}', 0)
+        cache.add(current_key, 0, window * 2)
+        current = cache.incr(current_key, cost)
+        excess = math.ceil(previous * (1 - into / window) + current - limit)
+        if excess <= 0:
+            return cost, 0
+        # Give back whatever did not fit.
+        excess = min(excess, cost)
+        cache.decr(current_key, excess)
+        if excess == cost:
+            return 0, self.retry_after(previous, current - cost, limit, window, into)
+        return cost - excess, 0
+
+    @staticmethod
+    def retry_after(previous, current, limit, window, into):
+        """Seconds until one more request fits (mirrors SLIDING_WINDOW_SCRIPT)"""
+        spare = limit - 1 - current
+        if previous > 0 and spare >= 0:
+            wait = (1 - spare / previous) * window - into
+        else:
+            wait = window - into
+            if current > 0:
+                wait += max(0, 1 - (limit - 1) / current) * window
+        return math.ceil(wait)
+
+
+class LocalTokenBucket:
+    """
+    Per-process token buckets in front of SlidingWindowLimiter.
+
+    Instead of asking Redis about every request, a process leases a batch of
+    tokens for a client and spends them locally until they run out or
+    LEASE_TTL passes. Leases start at one token and double each time a
+    client spends a whole lease before it expires, up to limit //
+    LEASE_FRACTION; a lease that expires part-spent shrinks to what was
+    used and its unspent tokens are refunded, so slow clients are counted
+    exactly and only busy clients are batched. A client that Redis refuses
+    is remembered as blocked for its retry_after, so further requests from
+    it are rejected in-process without any Redis call; a
+    credential-stuffing burst therefore costs one round trip per worker per
+    block period.
+    """
+
+    LEASE_FRACTION = 100
+    LEASE_TTL = 10           # seconds before unspent leased tokens are refunded
+    MAX_CLIENTS = 10000      # bucket states kept per process
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter or SlidingWindowLimiter()
+        self._states = LocalLRUCache(self.MAX_CLIENTS, RATE_LIMIT_WINDOW)
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, window=RATE_LIMIT_WINDOW):
+        """Spend one token for key; returns (allowed, retry_after)"""
+        return self.take_many([(key, limit, window)])
+
+    def take_many(self, rules):
+        """
+        Spend one token from each (key, limit, window) rule, all or none.
+        Rules whose leases ran out are renewed together in one limiter call.
+        """
+        now = time.monotonic()
+        with self._lock:
+            states = [
+                self._states.get(key)
+                or {'tokens': 0, 'lease_size': 0, 'lease_expires': 0.0, 'leased_at': 0.0, 'blocked_until': 0.0}
+                for key, _, _ in rules
+            ]
+            blocked = [state['blocked_until'] - now for state in states if state['blocked_until'] > now]
+            if blocked:
+                return False, math.ceil(max(blocked))
+            expired = [i for i, state in enumerate(states) if state['tokens'] < 1 or state['lease_expires'] <= now]
+            if not expired:
+                return self._spend(rules, states)
+            refunds = []
+            for i in expired:
+                state, (key, limit, window) = states[i], rules[i]
+                if state['lease_expires'] > now:
+                    size = state['lease_size'] * 2
+                else:
+                    size = state['lease_size'] - state['tokens']
+                    if state['tokens'] > 0:
+                        refunds.append((key, window, state['tokens'], state['leased_at']))
+                state['tokens'] = 0
+                state['lease_size'] = min(max(1, size), max(1, limit // self.LEASE_FRACTION))
+
+        for refund in refunds:
+            self.limiter.refund(*refund)
+        results = self.limiter.hit_many([
+            (key, limit, window, states[i]['lease_size'])
+            for i, (key, limit, window) in ((i, rules[i]) for i in expired)
+        ])
+        with self._lock:
+            if not all(granted for granted, _ in results):
+                for i, (_, retry_after) in zip(expired, results):
+                    if retry_after:
+                        states[i]['blocked_until'] = now + retry_after
+                    self._states.set(rules[i][0], states[i])
+                return False, max(retry_after for _, retry_after in results)
+            for i, (granted, _) in zip(expired, results):
+                states[i]['tokens'] = granted
+                states[i]['lease_size'] = granted
+                states[i]['lease_expires'] = now + self.LEASE_TTL
+                states[i]['leased_at'] = time.time()
+            return self._spend(rules, states)
+
+    def _spend(self, rules, states):
+        for (key, _, _), state in zip(rules, states):
+            state['tokens'] -= 1
+            self._states.set(key, state)
+        return True, 0
+
+
+class RateLimitRule:
+    """
+    One compiled rate limit rule: requests per hour for a counter scope.
+
+    methods maps HTTP methods to their own limit, counted under a separate
+    '<scope>:<METHOD>' counter. roles maps client roles (anon, guest, host,
+    admin) to a limit that replaces the method or default limit.
+    """
+
+    def __init__(self, scope, limit, methods=None, roles=None):
+        self.scope = scope
+        self.limit = limit
+        self.methods = methods or {}
+        self.roles = roles or {}
+
+    @classmethod
+    def from_setting(cls, pattern, value):
+        """Build a rule from a RATE_LIMIT_RULES entry (an int or a dict)"""
+        if isinstance(value, int):
+            value = {'limit': value}
+        methods = {method.upper(): limit for method, limit in value.get('methods', {}).items()}
+        return cls(value.get('scope', pattern), value['limit'], methods, value.get('roles'))
+
+    def resolve(self, method, get_role):
+        """(scope, limit) for a request; get_role is only called if needed"""
+        scope, limit = self.scope, self.limit
+        if method in self.methods:
+            scope, limit = f'{scope}:{method}', self.methods[method]
+        if self.roles:
+            limit = self.roles.get(get_role(), limit)
+        return scope, limit
+
+
+class RouteMatcher:
+    """
+    Rate limit rules compiled for lookup by URL name or path prefix.
+
+    Keys starting with '/' are path prefixes stored in a trie of path
+    segments, so '/api/reservations/' covers /api/reservations/ and
+    /api/reservations/7/ but not /api/v2/reservations/ or
+    /api/reservations-export/; the longest matching
+    prefix wins and a lookup costs one dict access per segment. Other keys
+    are URL names as passed to reverse() (e.g. 'property-detail'); they take
+    precedence over paths and suit routes with parameters.
+    """
+
+    class Node:
+        __slots__ = ('children', 'rule')
+
+        def __init__(self):
+            self.children = {}
+            self.rule = None
+
+    def __init__(self, rules):
+        self.names = {}
+        self.root = self.Node()
+        for pattern, value in rules.items():
+            rule = RateLimitRule.from_setting(pattern, value)
+            if not pattern.startswith('/'):
+                self.names[pattern] = rule
+                continue
+            node = self.root
+            for segment in filter(None, pattern.split('/')):
+                node = node.children.setdefault(segment, self.Node())
+            node.rule = rule
+
+    def match(self, path, url_name=None):
+        """The rule for url_name, else the longest path prefix rule"""
+        if url_name in self.names:
+            return self.names[url_name]
+        node = self.root
+        rule = node.rule
+        for segment in filter(None, path.split('/')):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            rule = node.rule or rule
+        return rule
+
+
+class ThrottleEngine:
+    """
+    Single throttling decision for a request, shared by RateLimitMiddleware
+    and the DRF throttle classes below.
+
+    A request is checked against its endpoint rule plus any extra rules the
+    caller passes, such as the DEFAULT_THROTTLE_RATES of the view's
+    throttles. All of them go through LocalTokenBucket in one call, so at
+    most one Redis round trip is made per request, and the outcome is
+    remembered on the request so no rule is ever counted twice.
+
+    Endpoint rules are ENDPOINT_LIMITS updated with settings.RATE_LIMIT_RULES
+    and are compiled into a RouteMatcher when the engine is created.
+    """
+
+    # Endpoint rate limits (key: path prefix or URL name, value: requests per
+    # hour, or a dict with 'limit' and optional 'scope', 'methods', 'roles')
+    ENDPOINT_LIMITS = {
+        '/': {'limit': 100, 'scope': 'default'},        # Conservative default
+        '/api/': {'limit': 1000, 'scope': 'api'},       # General API
+        '/health/': {'limit': 10000, 'scope': 'health'},
+        '/api/register/': 5,           # 5 per hour
+        '/api/token/': 10,             # 10 per hour (login attempts)
+        '/api/password-reset/': 3,     # 3 per hour
+        '/api/send-email/': 20,        # 20 per hour
+        '/api/reservations/': 50,      # 50 per hour
+        '/api/feedback/': 50,          # 50 per hour (reviews)
+    }
+
+    EXEMPT_PATHS = ('/health/', '/health/live/', '/health/ready/', '/metrics/')
+
+    def __init__(self):
+        self.buckets = LocalTokenBucket()
+        self.load_rules()
+
+    def load_rules(self):
+        """Compile ENDPOINT_LIMITS and settings.RATE_LIMIT_RULES"""
+        self.routes = RouteMatcher({**self.ENDPOINT_LIMITS, **getattr(settings, 'RATE_LIMIT_RULES', {})})
+
+    def check(self, request, rules=()):
+        """
+        Count the request against its endpoint rule and rules, once.
+        Returns None if allowed, or the seconds to wait if limited. rules
+        is only consumed on the first check of a request.
+        """
+        http_request = getattr(request, '_request', request)
+        if not hasattr(http_request, '_throttle_wait'):
+            http_request._throttle_wait = self._evaluate(request, rules)
+        return http_request._throttle_wait
+
+    def _evaluate(self, request, rules):
+        # Skip rate limiting for health checks
+        if request.path in self.EXEMPT_PATHS:
+            return None
+
+        # Each endpoint rule has its own counter
+        client_id = self.get_client_id(request)
+        scope, limit = self.get_rate_limit(request)
+        rules = [(f'rate_limit:{client_id}:{scope}', limit, RATE_LIMIT_WINDOW), *rules]
+
+        allowed, retry_after = self.buckets.take_many(rules)
+        RATE_LIMIT_DECISIONS.labels(scope, 'allowed' if allowed else 'limited').inc()
+        if not allowed:
+            logger.warning(f'Rate limit exceeded for {client_id} on {request.path}')
+            return max(retry_after, 1)
+        return None
+
+    def get_client_id(self, request):
+        """Get unique identifier for client (user ID or IP address)"""
+        if request.user and request.user.is_authenticated:
+            return f'user_{request.user.id}'
+        
+        # Get client IP
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip = x_forwarded_for.split(',')[0]
+        else:
+            ip = request.META.get('REMOTE_ADDR')
+        
+        return f'ip_{ip}'
+    
+    def get_rate_limit(self, request):
+        """Get the (scope, requests per hour) rule for a request"""
+        resolver_match = getattr(request, 'resolver_match', None)
+        rule = self.routes.match(request.path, resolver_match.view_name if resolver_match else None)
+        return rule.resolve(request.method, lambda: self.get_role(request))
+    
+    def get_role(self, request):
+        """Role used for per-role rule overrides"""
+        user = request.user
+        if not user or not user.is_authenticated:
+            return 'anon'
+        if user.is_staff or user.is_superuser:
+            return 'admin'
+        profile = getattr(user, 'profile', None)
+        return profile.user_role if profile else 'guest'
+
+
+throttle_engine = ThrottleEngine()
+
+
+@receiver(setting_changed)
+def reload_rate_limit_rules(setting, **kwargs):
+    if setting == 'RATE_LIMIT_RULES':
+        throttle_engine.load_rules()
+
+
+class UnifiedRateThrottle(SimpleRateThrottle):
+    """
+    DRF throttle evaluated by throttle_engine.
+
+    The rate still comes from DEFAULT_THROTTLE_RATES[scope], but instead of
+    SimpleRateThrottle's per-client timestamp list it is kept in the
+    engine's fixed-size sliding-window counters. The first throttle checked
+    on a request collects the rules of every UnifiedRateThrottle on the view
+    and checks them together with the endpoint rule; the others reuse that
+    decision.
+    """
+
+    def get_rule(self, request, view):
+        """(key, limit, window) for this request, or None to skip it"""
+        if self.rate is None:
+            return None
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return None
+        return key, self.num_requests, self.duration
+
+    def allow_request(self, request, view):
+        # A generator, so the view's throttles are only gathered by the
+        # first check on the request.
+        rules = (
+            rule for throttle in view.get_throttles()
+            if isinstance(throttle, UnifiedRateThrottle)
+            for rule in [throttle.get_rule(request, view)] if rule
+        )
+        self.retry_after = throttle_engine.check(request, rules)
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class CustomUserRateThrottle(UnifiedRateThrottle):
     """
     Custom rate throttle for authenticated users.
     Limit: 1000 requests per hour per user
     """
     scope = 'user_throttle'
     
-    def get_cache_key(self):
-        if self.request.user and self.request.user.is_authenticated:
-            return f'rate_limit_user_{self.request.user.id}'
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'rate_limit_user_{request.user.id}'
         return None
 
 
-class CustomAnonRateThrottle(AnonRateThrottle):
+class CustomAnonRateThrottle(UnifiedRateThrottle):
     """
     Custom rate throttle for anonymous users.
     Limit: 100 requests per hour per IP
     """
     scope = 'anon_throttle'
     
-    def get_cache_key(self):
-        if self.request.user and self.request.user.is_authenticated:
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
             return None  # Skip for authenticated users
-        return f'rate_limit_anon_{self.get_ident(self.request)}'
+        return f'rate_limit_anon_{self.get_ident(request)}'
 
 
-class StrictRateThrottle(UserRateThrottle):
+class StrictRateThrottle(UnifiedRateThrottle):
     """
     Strict rate throttle for sensitive endpoints (auth, payments).
     Limit: 10 requests per minute per user
     """
     scope = 'strict_throttle'
     
-    def get_cache_key(self):
-        ident = self.request.user.id if self.request.user and self.request.user.is_authenticated else self.get_ident(self.request)
+    def get_cache_key(self, request, view):
+        ident = request.user.id if request.user and request.user.is_authenticated else self.get_ident(request)
         return f'rate_limit_strict_{ident}'
 
 
-class BurstRateThrottle(AnonRateThrottle):
+class BurstRateThrottle(UnifiedRateThrottle):
     """
     Burst throttle for public endpoints (listings).
     Limit: 5000 requests per hour
     """
     scope = 'burst_throttle'
     
-    def get_cache_key(self):
-        ident = self.request.user.id if self.request.user and self.request.user.is_authenticated else self.get_ident(self.request)
+    def get_cache_key(self, request, view):
+        ident = request.user.id if request.user and request.user.is_authenticated else self.get_ident(request)
         return f'rate_limit_burst_{ident}'
 
 
 class RateLimitMiddleware:
     """
     Custom middleware for advanced rate limiting with per-endpoint configuration.
+
+    DRF views that use UnifiedRateThrottle classes are left to those
+    throttles, which run after authentication and include the endpoint rule
+    in their single engine check; every other view is checked here.
+    Requests a DRF view rejects before reaching its throttles (e.g. a bad
+    token) are still counted once the response is ready, and so are
+    requests that never reach a view (404s, path scans), which get a 429
+    instead of their response once over the limit.
     """
     
-    # Endpoints with special rate limits (key: path pattern, value: requests per hour)
-    ENDPOINT_LIMITS = {
-        '/api/register/': 5,           # 5 per hour
-        '/api/token/': 10,             # 10 per hour (login attempts)
-        '/api/password-reset/': 3,     # 3 per hour
-        '/api/send-email/': 20,        # 20 per hour
-        '/api/bookings/': 50,          # 50 per hour
-        '/api/reviews/': 50,           # 50 per hour
-    }
-    
     def __init__(self, get_response):
         self.get_response = get_response
+        self.engine = throttle_engine
     
     def __call__(self, request):
-        # Check rate limit
-        if not self.is_rate_limited(request):
-            response = self.get_response(request)
-            return response
-        else:
-            return JsonResponse(
-                {'error': 'Rate limit exceeded. Please try again later.'},
-                status=429
-            )
+        response = self.get_response(request)
+        if not hasattr(request, '_throttle_wait'):
+            retry_after = self.engine.check(request)
+            if retry_after is not None and not getattr(request, '_throttle_deferred', False):
+                return self.limited_response(retry_after)
+        return response
     
-    def is_rate_limited(self, request):
-        """
-        Check if request exceeds rate limit.
-        Returns True if limited, False if allowed.
-        """
-        # Skip rate limiting for health checks
-        if request.path in ['/health/', '/health/live/', '/health/ready/', '/metrics/']:
-            return False
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.throttled_by_view(view_func):
+            request._throttle_deferred = True
+            return None
         
-        # Get client identifier
-        client_id = self.get_client_id(request)
-        cache_key = f'rate_limit_{client_id}_{self.get_path_pattern(request.path)}'
-        
-        # Get limit for this endpoint
-        limit = self.get_rate_limit(request.path)
-        
-        # Check current request count
-        current_count = cache.get(cache_key, 0)
-        
-        if current_count >= limit:
-            logger.warning(f'Rate limit exceeded for {client_id} on {request.path}')
-            return True
-        
-        # Increment counter (expire after 1 hour)
-        cache.set(cache_key, current_count + 1, 3600)
-        return False
-    
-    def get_client_id(self, request):
-        """Get unique identifier for client (user ID or IP address)"""
-        if request.user and request.user.is_authenticated:
-            return f'user_{request.user.id}'
-        
-        # Get client IP
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        
-        return f'ip_{ip}'
+        retry_after = self.engine.check(request)
+        if retry_after is None:
+            return None
+        return self.limited_response(retry_after)
     
-    def get_path_pattern(self, path):
-        """Normalize path for rate limiting"""
-        # Extract base path
-        parts = path.strip('/').split('/')
-        if parts:
-            return parts[0]  # e.g., 'api', 'health'
-        return 'root'
+    @staticmethod
+    def limited_response(retry_after):
+        response = JsonResponse(
+            {'error': 'Rate limit exceeded. Please try again later.'},
+            status=429
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
     
-    def get_rate_limit(self, path):
-        """Get rate limit for a specific path"""
-        for pattern, limit in self.ENDPOINT_LIMITS.items():
-            if pattern in path:
-                return limit
-        
-        # Default limits
-        if path.startswith('/api/'):
-            return 1000  # 1000 requests per hour for general API
-        elif path.startswith('/health'):
-            return 10000  # Health checks have higher limit
-        else:
-            return 100  # Conservative default
+    @staticmethod
+    def throttled_by_view(view_func):
+        """Whether view_func is a DRF view with UnifiedRateThrottle classes"""
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            return False
+        throttle_classes = getattr(view_func, 'initkwargs', {}).get('throttle_classes', view_class.throttle_classes)
+        return any(issubclass(throttle, UnifiedRateThrottle) for throttle in throttle_classes)
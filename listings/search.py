@@ -0,0 +1,145 @@
+"""
+Search backends for property listings.
+
+Provides:
+- ListingSearchFilter: ranked full-text search for ?search=
+- NullsLastOrderingFilter: ?ordering= with unset values sorted last
+- LocationAutocomplete: location suggestions for /api/listings/autocomplete/
+
+On PostgreSQL, ?search= terms are matched against the GIN-indexed, weighted
+Property.search_vector column (title > location > description) and results
+are ordered by ts_rank, while location suggestions use the pg_trgm indexes on
+property_location. Other databases (SQLite under airbnb.test_settings) fall
+back to icontains/istartswith lookups, so tests exercise the same endpoints
+without PostgreSQL.
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F
+from rest_framework import filters
+
+from .caching import LocalLRUCache
+from .models import LISTING_SEARCH_CONFIG, Property
+
+# Location autocomplete tuning
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_MAX_LENGTH = 100
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 25
+AUTOCOMPLETE_PREFIX_CANDIDATES = 500   # prefix-matching rows read before distinct/sort
+AUTOCOMPLETE_CACHE_SIZE = 2048   # distinct (prefix, limit) entries per process
+AUTOCOMPLETE_CACHE_TTL = 60      # seconds
+
+
+class ListingSearchFilter(filters.SearchFilter):
+    """
+    Ranked full-text search filter for ListingManagementViewSet.
+
+    Accepts web-search syntax ("quoted phrases", -exclusions, OR). An explicit
+    ?ordering= still wins over rank because OrderingFilter runs afterwards.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = request.query_params.get(self.search_param, '').strip()
+        if not search_terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        search_query = SearchQuery(search_terms, search_type='websearch', config=LISTING_SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-listed_on')
+
+
+class NullsLastOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that sorts NULLs last in both directions for the view's
+    nulls_last_fields, e.g. unrated listings after rated ones on
+    ?ordering=-rating_average. PostgreSQL would otherwise put them first.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        nulls_last_fields = getattr(view, 'nulls_last_fields', ())
+        return queryset.order_by(*(self.nulls_last(term, nulls_last_fields) for term in ordering))
+
+    @staticmethod
+    def nulls_last(term, nulls_last_fields):
+        field = term.lstrip('-')
+        if field not in nulls_last_fields:
+            return term
+        if term.startswith('-'):
+            return F(field).desc(nulls_last=True)
+        return F(field).asc(nulls_last=True)
+
+
+class PrefixLRUCache(LocalLRUCache):
+    """
+    In-process LRU for the hottest autocomplete prefixes.
+
+    Repeated keystrokes from many users are answered without a database
+    round trip. Entries expire after ttl seconds, bounding how stale a
+    suggestion list can be.
+    """
+
+
+class LocationAutocomplete:
+    """
+    Distinct property_location suggestions for a typed prefix.
+
+    Prefix matches come first (istartswith, a range scan on the ordered
+    UPPER(property_location) index); remaining slots are filled with fuzzy
+    word-similarity matches on PostgreSQL, best match first.
+
+    Only the first AUTOCOMPLETE_PREFIX_CANDIDATES prefix-matching rows are
+    de-duplicated and sorted, so one- and two-letter prefixes cost the same
+    as long ones however many listings match.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def normalize(query):
+        return ' '.join(query.split())[:AUTOCOMPLETE_MAX_LENGTH]
+
+    def suggest(self, query, limit=AUTOCOMPLETE_DEFAULT_LIMIT):
+        query = self.normalize(query)
+        if len(query) < AUTOCOMPLETE_MIN_LENGTH:
+            return []
+
+        cache_key = (query.lower(), limit)
+        suggestions = self.cache.get(cache_key)
+        if suggestions is None:
+            suggestions = self.lookup(query, limit)
+            self.cache.set(cache_key, suggestions)
+        return suggestions
+
+    def lookup(self, query, limit):
+        locations = Property.objects.order_by()
+        candidates = locations.filter(property_location__istartswith=query).values('pk')
+        suggestions = list(
+            locations.filter(pk__in=candidates[:AUTOCOMPLETE_PREFIX_CANDIDATES])
+            .values_list('property_location', flat=True)
+            .distinct()
+            .order_by('property_location')[:limit]
+        )
+        if len(suggestions) >= limit or connections[locations.db].vendor != 'postgresql':
+            return suggestions
+
+        fuzzy_matches = (
+            locations.filter(property_location__trigram_word_similar=query)
+            .exclude(property_location__in=suggestions)
+            .annotate(similarity=TrigramWordSimilarity(query, 'property_location'))
+            .values_list('property_location', 'similarity')
+            .distinct()
+            .order_by('-similarity', 'property_location')[:limit - len(suggestions)]
+        )
+        return suggestions + [location for location, _ in fuzzy_matches]
+
+
+location_autocomplete = LocationAutocomplete(
+    PrefixLRUCache(AUTOCOMPLETE_CACHE_SIZE, AUTOCOMPLETE_CACHE_TTL)
+)
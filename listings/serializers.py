@@ -44,7 +44,7 @@ class ListingPhotoSerializer(serializers.ModelSerializer):
 
 class ListingDataSerializer(serializers.ModelSerializer):
 	owner_username = serializers.CharField(source='property_owner.username', read_only=True)
-	attached_photos = ListingPhotoSerializer(many=True, read_only=True)
+	attached_photos = ListingPhotoSerializer(source='images', many=True, read_only=True)
 	computed_average_score = serializers.SerializerMethodField()
 	feedback_total = serializers.SerializerMethodField()
 	
@@ -57,14 +57,12 @@ class ListingDataSerializer(serializers.ModelSerializer):
 		read_only_fields = ['id', 'property_owner']
 	
 	def get_computed_average_score(self, obj):
-		feedback_items = obj.reviews.all()
-		if feedback_items:
-			score_sum = sum(item.rating_score for item in feedback_items)
-			return round(score_sum / len(feedback_items), 1)
+		if obj.rating_count and obj.rating_average is not None:
+			return round(obj.rating_average, 1)
 		return None
 	
 	def get_feedback_total(self, obj):
-		return obj.reviews.count()
+		return obj.rating_count
 	
 	def validate_nightly_rate(self, value):
 		if value <= 0:
@@ -117,26 +115,20 @@ class ReservationDataSerializer(serializers.ModelSerializer):
 					'departure_date': 'Stays exceeding 365 nights not permitted'
 				})
 			
-			property_target = data.get('reserved_property')
+			property_target = data.get('reserved_property') or getattr(self.instance, 'reserved_property', None)
 			if property_target and property_target.listing_status != 'available':
 				raise serializers.ValidationError({
 					'reserved_property': 'Selected property is not available for booking'
 				})
 			
-			overlap_query = Booking.objects.filter(
-				reserved_property=property_target,
-				reservation_state__in=['awaiting_approval', 'approved']
+			existing_booking = Booking.find_overlapping(
+				property_target, arrival, departure,
+				exclude_pk=self.instance.pk if self.instance else None
 			)
-			
-			if self.instance:
-				overlap_query = overlap_query.exclude(pk=self.instance.pk)
-			
-			for existing_booking in overlap_query:
-				if not (departure <= existing_booking.arrival_date or 
-						arrival >= existing_booking.departure_date):
-					raise serializers.ValidationError({
-						'arrival_date': f'Dates conflict with existing reservation from {existing_booking.arrival_date} to {existing_booking.departure_date}'
-					})
+			if existing_booking:
+				raise serializers.ValidationError({
+					'arrival_date': f'Dates conflict with existing reservation from {existing_booking.arrival_date} to {existing_booking.departure_date}'
+				})
 		
 		return data
 
@@ -1,6 +1,12 @@
 from celery import shared_task
+from django.contrib.auth.models import User
 from django.core.mail import send_mail
 
+from airbnb.metrics import ACTIVE_BOOKING_GAUGE_STATES, set_business_gauges
+
+from .caching import invalidate_tags, warm_homepage_cache, warm_popular_properties_cache
+from .models import Booking, Property, PropertyAvailability
+
 
 @shared_task
 def example_add(x, y):
@@ -17,3 +23,44 @@ def send_notification_email(subject, message, recipient):
         fail_silently=False,
     )
     return f"Email sent to {recipient}"
+
+
+@shared_task
+def refresh_availability_calendars():
+    """Roll every listing's availability horizon forward to start today."""
+    listing_ids = PropertyAvailability.objects.values_list('listing_id', flat=True)
+    refreshed = 0
+    for listing_id in listing_ids.iterator():
+        PropertyAvailability.rebuild_for(listing_id, create=False)
+        refreshed += 1
+    invalidate_tags('availability')
+    return f"Refreshed {refreshed} availability calendars"
+
+
+@shared_task
+def warm_popular_listings():
+    """Keep the detail pages of the most popular listings cached."""
+    warmed = warm_popular_properties_cache()
+    return f"Warmed {warmed} listing detail pages"
+
+
+@shared_task
+def warm_homepage():
+    """Rebuild the cached homepage featured listings."""
+    warm_homepage_cache()
+    return "Warmed homepage featured listings"
+
+
+@shared_task
+def reconcile_business_metrics():
+    """Reset the /metrics/ business gauges to exact counts."""
+    counts = {
+        'airbnb_users_total': User.objects.count(),
+        'airbnb_properties_total': Property.objects.count(),
+        'airbnb_bookings_total': Booking.objects.count(),
+        'airbnb_active_bookings_total': Booking.objects.filter(
+            reservation_state__in=ACTIVE_BOOKING_GAUGE_STATES
+        ).count(),
+    }
+    set_business_gauges(counts)
+    return f"Reconciled {len(counts)} business gauges"
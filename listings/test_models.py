@@ -1,6 +1,14 @@
+from io import StringIO
+from datetime import date, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.contrib.auth.models import User
-from .models import Property, UserProfile, Booking, Address, CustomerPreferences
+from .models import BookedNightsIn, Property, PropertyAvailability, UserProfile, Booking, Review, Address, CustomerPreferences
 
 class UserProfileModelTest(TestCase):
     """
@@ -77,3 +85,285 @@ class BookingManagementModelTest(TestCase):
         booking_str = str(self.booking_instance)
         self.assertIn(self.guest_account.username, booking_str)
         self.assertIn(self.property_instance.listing_title, booking_str)
+
+class PropertyRatingAggregateTest(TestCase):
+    """
+    Tests for the stored rating aggregates maintained by review signals.
+    """
+    def setUp(self):
+        self.owner_account = User.objects.create_user(
+            username='rated_host',
+            password='host_pass_123'
+        )
+        self.reviewers = [
+            User.objects.create_user(username=f'rater_{i}', password='rater_pass_123')
+            for i in range(2)
+        ]
+        self.property_instance = Property.objects.create(
+            property_owner=self.owner_account,
+            listing_title='Lakeside Cabin',
+            property_location='Lake District',
+            nightly_rate=90.00
+        )
+
+    def assert_aggregates(self, property_instance, rating_sum, rating_count, rating_average):
+        property_instance.refresh_from_db()
+        self.assertEqual(property_instance.rating_sum, rating_sum)
+        self.assertEqual(property_instance.rating_count, rating_count)
+        self.assertEqual(property_instance.rating_average, rating_average)
+
+    def test_aggregates_follow_review_lifecycle(self):
+        """
+        Verify create, edit and delete keep sum, count and average in step.
+        """
+        first = Review.objects.create(
+            reviewer=self.reviewers[0], reviewed_property=self.property_instance, rating_score=5
+        )
+        Review.objects.create(
+            reviewer=self.reviewers[1], reviewed_property=self.property_instance, rating_score=2
+        )
+        self.assert_aggregates(self.property_instance, 7, 2, 3.5)
+
+        first.rating_score = 4
+        first.save()
+        self.assert_aggregates(self.property_instance, 6, 2, 3.0)
+
+        first.delete()
+        self.assert_aggregates(self.property_instance, 2, 1, 2.0)
+
+        Review.objects.all().delete()
+        self.assert_aggregates(self.property_instance, 0, 0, None)
+
+    def test_moving_review_between_properties(self):
+        """
+        Verify re-targeting a review moves its score to the new property.
+        """
+        other_property = Property.objects.create(
+            property_owner=self.owner_account,
+            listing_title='Harbour Loft',
+            property_location='Harbourfront',
+            nightly_rate=140.00
+        )
+        review = Review.objects.create(
+            reviewer=self.reviewers[0], reviewed_property=self.property_instance, rating_score=3
+        )
+        review.reviewed_property = other_property
+        review.save()
+
+        self.assert_aggregates(self.property_instance, 0, 0, None)
+        self.assert_aggregates(other_property, 3, 1, 3.0)
+
+    def test_rebuild_command_restores_aggregates(self):
+        """
+        Verify the rebuild command recomputes aggregates from reviews.
+        """
+        Review.objects.create(
+            reviewer=self.reviewers[0], reviewed_property=self.property_instance, rating_score=4
+        )
+        Review.objects.create(
+            reviewer=self.reviewers[1], reviewed_property=self.property_instance, rating_score=1
+        )
+        Property.objects.update(rating_sum=0, rating_count=0, rating_average=None)
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+
+        self.assert_aggregates(self.property_instance, 5, 2, 2.5)
+
+    def test_migration_backfills_aggregates(self):
+        """
+        Verify migration 0004 fills in aggregates for existing reviews.
+        """
+        Review.objects.create(
+            reviewer=self.reviewers[0], reviewed_property=self.property_instance, rating_score=3
+        )
+        Property.objects.update(rating_sum=0, rating_count=0, rating_average=None)
+        migration = import_module('listings.migrations.0004_property_rating_aggregates')
+
+        with connection.cursor() as cursor:
+            migration.backfill_rating_aggregates(apps, SimpleNamespace(execute=cursor.execute))
+
+        self.assert_aggregates(self.property_instance, 3, 1, 3.0)
+
+class BookingOverlapTest(TestCase):
+    """
+    Tests for overlap detection shared by Booking.clean() and the serializer.
+    """
+    def setUp(self):
+        self.guest_account = User.objects.create_user(
+            username='overlap_guest',
+            password='guest_pass_123'
+        )
+        self.owner_account = User.objects.create_user(
+            username='overlap_host',
+            password='host_pass_123'
+        )
+        self.property_instance = Property.objects.create(
+            property_owner=self.owner_account,
+            listing_title='Garden Flat',
+            property_location='Old Town',
+            nightly_rate=110.00
+        )
+        self.arrival = date.today() + timedelta(days=10)
+        self.existing = self.book(self.arrival, self.arrival + timedelta(days=5))
+
+    def book(self, arrival, departure, **kwargs):
+        return Booking.objects.create(
+            guest=self.guest_account,
+            reserved_property=self.property_instance,
+            arrival_date=arrival,
+            departure_date=departure,
+            **kwargs
+        )
+
+    def test_overlapping_booking_rejected(self):
+        """
+        Verify a stay sharing a night with an active booking is refused.
+        """
+        with self.assertRaises(ValidationError):
+            self.book(self.arrival + timedelta(days=4), self.arrival + timedelta(days=8))
+        self.assertEqual(
+            Booking.find_overlapping(
+                self.property_instance, self.arrival - timedelta(days=2), self.arrival + timedelta(days=1)
+            ),
+            self.existing
+        )
+
+    def test_back_to_back_booking_allowed(self):
+        """
+        Verify check-out day may be the next guest's check-in day.
+        """
+        self.book(self.arrival + timedelta(days=5), self.arrival + timedelta(days=7))
+        self.book(self.arrival - timedelta(days=3), self.arrival)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_inactive_bookings_do_not_block(self):
+        """
+        Verify rejected reservations release their nights.
+        """
+        self.existing.reservation_state = 'rejected'
+        self.existing.save()
+        self.book(self.arrival, self.arrival + timedelta(days=5))
+        self.assertIsNone(
+            Booking.find_overlapping(
+                self.property_instance, self.arrival, self.arrival + timedelta(days=5),
+                exclude_pk=Booking.objects.latest('booked_on').pk
+            )
+        )
+
+    def test_editing_booking_ignores_itself(self):
+        """
+        Verify an existing booking can be re-saved over its own nights.
+        """
+        self.existing.departure_date = self.arrival + timedelta(days=6)
+        self.existing.save()
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.duration_nights, 6)
+
+class PropertyAvailabilityTest(TestCase):
+    """
+    Tests for the availability bitmap kept in sync by booking signals.
+    """
+    def setUp(self):
+        self.guest_account = User.objects.create_user(
+            username='calendar_guest',
+            password='guest_pass_123'
+        )
+        self.owner_account = User.objects.create_user(
+            username='calendar_host',
+            password='host_pass_123'
+        )
+        self.property_instance = Property.objects.create(
+            property_owner=self.owner_account,
+            listing_title='Beach House',
+            property_location='Seaside',
+            nightly_rate=200.00
+        )
+        self.arrival = date.today() + timedelta(days=20)
+        self.departure = self.arrival + timedelta(days=3)
+        self.booking = Booking.objects.create(
+            guest=self.guest_account,
+            reserved_property=self.property_instance,
+            arrival_date=self.arrival,
+            departure_date=self.departure
+        )
+
+    def availability(self):
+        return PropertyAvailability.objects.get(listing=self.property_instance)
+
+    def test_booking_marks_nights(self):
+        """
+        Verify each booked night is set and check-out day stays free.
+        """
+        availability = self.availability()
+        self.assertEqual(len(availability.booked_nights), 92)
+        self.assertTrue(availability.is_booked(self.arrival))
+        self.assertTrue(availability.is_booked(self.departure - timedelta(days=1)))
+        self.assertFalse(availability.is_booked(self.departure))
+        self.assertFalse(availability.is_free(self.arrival - timedelta(days=1), self.arrival + timedelta(days=1)))
+        self.assertTrue(availability.is_free(self.departure, self.departure + timedelta(days=7)))
+        self.assertIsNone(availability.is_booked(date.today() + timedelta(days=PropertyAvailability.HORIZON_NIGHTS)))
+
+    def test_cancel_and_delete_release_nights(self):
+        """
+        Verify leaving the active states or deleting frees the nights.
+        """
+        self.booking.reservation_state = 'cancelled'
+        self.booking.save(update_fields=['reservation_state', 'last_updated'])
+        self.assertTrue(self.availability().is_free(self.arrival, self.departure))
+
+        self.booking.reservation_state = 'approved'
+        self.booking.save()
+        self.assertFalse(self.availability().is_free(self.arrival, self.departure))
+
+        self.booking.delete()
+        self.assertTrue(self.availability().is_free(self.arrival, self.departure))
+
+    def test_available_between_filter(self):
+        """
+        Verify the listing filter excludes only listings booked in the window.
+        """
+        free_property = Property.objects.create(
+            property_owner=self.owner_account,
+            listing_title='Mountain Hut',
+            property_location='Highlands',
+            nightly_rate=80.00
+        )
+        overlapping = Property.objects.available_between(self.arrival + timedelta(days=1), self.departure)
+        self.assertEqual(list(overlapping), [free_property])
+
+        later = Property.objects.available_between(self.departure, self.departure + timedelta(days=2))
+        self.assertEqual(set(later), {free_property, self.property_instance})
+
+        beyond_horizon = date.today() + timedelta(days=PropertyAvailability.HORIZON_NIGHTS + 10)
+        self.assertEqual(
+            Property.objects.available_between(beyond_horizon, beyond_horizon + timedelta(days=1)).count(), 2
+        )
+
+    def test_available_between_tests_bits_in_sql(self):
+        """
+        Verify PostgreSQL answers the bitmap check in the query itself.
+        """
+        from django.db.backends.postgresql.base import DatabaseWrapper
+
+        postgresql = DatabaseWrapper(connection.settings_dict, alias='postgresql')
+        query = PropertyAvailability.objects.filter(BookedNightsIn(self.arrival, self.departure)).query
+        sql, params = query.get_compiler(connection=postgresql).as_sql()
+
+        self.assertIn('generate_series(%s - "property_availability"."horizon_start"', sql)
+        self.assertIn('get_bit("property_availability"."booked_nights", night) = 1', sql)
+        self.assertEqual(params, (self.arrival, self.departure))
+
+    def test_migration_backfills_calendars(self):
+        """
+        Verify migration 0006 builds calendars for existing reservations.
+        """
+        PropertyAvailability.objects.all().delete()
+        migration = import_module('listings.migrations.0006_property_availability')
+
+        migration.backfill_availability(apps, SimpleNamespace(connection=connection))
+
+        availability = self.availability()
+        rebuilt = PropertyAvailability.rebuild_for(self.property_instance.pk)
+        self.assertEqual(availability.horizon_start, date.today())
+        self.assertEqual(bytes(availability.booked_nights), bytes(rebuilt.booked_nights))
+        self.assertFalse(availability.is_free(self.arrival, self.departure))
@@ -8,22 +8,59 @@ Tests:
 - Email sending with mocking
 """
 
-from django.test import TestCase, Client
-from django.contrib.auth.models import User
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import JsonResponse
 from django.core import mail
-from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from django.urls import resolve, reverse
+from django.core.cache import cache
+from django.apps import apps
+from django.db import connection, connections, transaction
+from django.db.utils import OperationalError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.views import APIView
 from unittest.mock import patch, MagicMock
+from psycopg2 import OperationalError as PsycopgOperationalError
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_UNKNOWN
+)
 from datetime import date, timedelta
 from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+import gzip
+import json
+import os
+import threading
+import time
 
+from airbnb.db_backends.pooled_postgresql.base import ConnectionPool
+from airbnb.db_routers import (
+    PIN_COOKIE, ReadYourWritesMiddleware, ReplicaRouter, ReplicaSet, current_replica, pinned_to_primary, replica_reads
+)
+from airbnb.health_checks import HealthProber, check_replicas
+from airbnb.metrics import get_business_gauges, registry as metrics_registry, render_metrics
+from airbnb.timing import RequestTimings, current_timings, timed
 from listings.models import (
-    UserProfile, Property, Booking, Review, Wishlist
+    UserProfile, Property, PropertyImage, Booking, Review, Wishlist
 )
 from listings.serializers import EmailNotificationSerializer
-from listings.tasks import send_notification_email
+from listings.caching import (
+    CACHE_TTL, TwoTierCache, cache_response, get_or_recompute, hot_cache, invalidate_tags, property_tag,
+    tag_changed_key, tag_version_key
+)
+from listings.rate_limiting import (
+    CustomAnonRateThrottle, CustomUserRateThrottle, LocalTokenBucket, RATE_LIMIT_WINDOW,
+    RateLimitMiddleware, RouteMatcher, SlidingWindowLimiter, throttle_engine,
+)
+from listings.search import PrefixLRUCache, location_autocomplete
+from listings.tasks import reconcile_business_metrics, send_notification_email, warm_homepage, warm_popular_listings
+from listings.views import ListingManagementViewSet
 
 
 class EmailNotificationSerializerTest(TestCase):
@@ -338,6 +375,786 @@ class PropertyCRUDTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class ListingQueryCountTest(APITestCase):
+    """Regression tests for the number of queries issued by listing endpoints"""
+
+    # One keyset page of listings joined with owners, one batched photo
+    # prefetch. Keyset pagination issues no COUNT.
+    LIST_QUERY_COUNT = 2
+
+    def setUp(self):
+        """Set up listings with photos and reviews"""
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(
+            username='host',
+            email='host@example.com',
+            password='testpass123'
+        )
+        self.reviewers = [
+            User.objects.create_user(username=f'reviewer{i}', password='testpass123')
+            for i in range(3)
+        ]
+        self.property_url = reverse('property-list')
+
+    def create_listings(self, count):
+        """Create listings that each have two photos and three reviews"""
+        for i in range(count):
+            prop = Property.objects.create(
+                property_owner=self.host_user,
+                listing_title=f'Listing {i}',
+                property_location='Test Location',
+                nightly_rate=Decimal('100.00')
+            )
+            PropertyImage.objects.create(listing=prop, photo='listing_photos/front.jpg')
+            PropertyImage.objects.create(listing=prop, photo='listing_photos/back.jpg')
+            for score, reviewer in enumerate(self.reviewers, start=3):
+                Review.objects.create(
+                    reviewer=reviewer,
+                    reviewed_property=prop,
+                    rating_score=score
+                )
+
+    def test_list_query_count_is_constant(self):
+        """Test listing page cost does not grow with page size"""
+        self.create_listings(2)
+        with self.assertNumQueries(self.LIST_QUERY_COUNT):
+            response = self.client.get(self.property_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.create_listings(10)
+        with self.assertNumQueries(self.LIST_QUERY_COUNT):
+            response = self.client.get(self.property_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 12)
+
+    def test_list_includes_review_stats_and_photos(self):
+        """Test annotated review stats and prefetched photos are rendered"""
+        self.create_listings(1)
+        response = self.client.get(self.property_url)
+
+        listing = response.data['results'][0]
+        self.assertEqual(listing['owner_username'], 'host')
+        self.assertEqual(listing['computed_average_score'], 4.0)
+        self.assertEqual(listing['feedback_total'], 3)
+        self.assertEqual(len(listing['attached_photos']), 2)
+
+    def test_rating_ordering_puts_unrated_listings_last(self):
+        """Test ?ordering=rating_average sorts listings without reviews last either way"""
+        self.create_listings(1)
+        Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Unrated Listing',
+            property_location='Test Location',
+            nightly_rate=Decimal('100.00')
+        )
+
+        for ordering in ('-rating_average', 'rating_average'):
+            response = self.client.get(self.property_url, {'ordering': ordering})
+            titles = [listing['listing_title'] for listing in response.data['results']]
+            self.assertEqual(titles, ['Listing 0', 'Unrated Listing'])
+
+    def test_retrieve_query_count(self):
+        """Test listing detail uses the same annotated queryset"""
+        self.create_listings(1)
+        prop = Property.objects.get()
+        url = reverse('property-detail', kwargs={'pk': prop.id})
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['feedback_total'], 3)
+
+
+class ListingAvailabilityAPITest(APITestCase):
+    """Tests for availability search and the listing calendar endpoint"""
+
+    def setUp(self):
+        """Set up a booked and a free listing"""
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        self.guest_user = User.objects.create_user(username='guest', password='testpass123')
+        self.booked_property = Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Booked Property',
+            property_location='Location 1',
+            nightly_rate=Decimal('100.00')
+        )
+        self.free_property = Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Free Property',
+            property_location='Location 2',
+            nightly_rate=Decimal('100.00')
+        )
+        self.arrival = date.today() + timedelta(days=40)
+        Booking.objects.create(
+            guest=self.guest_user,
+            reserved_property=self.booked_property,
+            arrival_date=self.arrival,
+            departure_date=self.arrival + timedelta(days=2)
+        )
+        self.property_url = reverse('property-list')
+
+    def test_filter_available_listings(self):
+        """Test available_from/available_to exclude booked listings"""
+        response = self.client.get(self.property_url, {
+            'available_from': self.arrival.isoformat(),
+            'available_to': (self.arrival + timedelta(days=1)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [listing['listing_title'] for listing in response.data['results']]
+        self.assertEqual(titles, ['Free Property'])
+
+    def test_filter_rejects_incomplete_window(self):
+        """Test both ends of the stay window are required"""
+        response = self.client.get(self.property_url, {'available_from': self.arrival.isoformat()})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_calendar_month_view(self):
+        """Test the calendar endpoint reports booked nights for a month"""
+        url = reverse('property-calendar', kwargs={'pk': self.booked_property.id})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'month': self.arrival.strftime('%Y-%m')})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        booked = [day['date'] for day in response.data['days'] if day['booked']]
+        self.assertIn(self.arrival, booked)
+        self.assertNotIn(self.arrival + timedelta(days=2), booked)
+
+    def test_calendar_unknown_listing(self):
+        """Test the calendar endpoint returns 404 for missing listings"""
+        url = reverse('property-calendar', kwargs={'pk': 9999})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_calendar_non_numeric_listing(self):
+        """Test a malformed listing ID is a 404 like the detail view, not a 500"""
+        url = reverse('property-calendar', kwargs={'pk': 'abc'})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        detail = self.client.get(reverse('property-detail', kwargs={'pk': 'abc'}))
+        self.assertEqual(detail.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ListingSearchTest(APITestCase):
+    """Tests for listing search through ListingSearchFilter"""
+
+    def setUp(self):
+        """Set up listings with distinct text"""
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Lakeside Cabin',
+            property_location='Lake Tahoe',
+            nightly_rate=Decimal('120.00'),
+            property_description='Wood stove and private dock'
+        )
+        Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='City Loft',
+            property_location='Downtown',
+            nightly_rate=Decimal('180.00'),
+            property_description='Walk to the lake ferry'
+        )
+        self.property_url = reverse('property-list')
+
+    def test_search_matches_title_location_and_description(self):
+        """Test search terms match every searchable field"""
+        response = self.client.get(self.property_url, {'search': 'cabin'})
+        self.assertEqual(
+            [listing['listing_title'] for listing in response.data['results']],
+            ['Lakeside Cabin']
+        )
+
+        response = self.client.get(self.property_url, {'search': 'ferry'})
+        self.assertEqual(
+            [listing['listing_title'] for listing in response.data['results']],
+            ['City Loft']
+        )
+
+    def test_search_without_matches(self):
+        """Test search with no matching listings returns an empty page"""
+        response = self.client.get(self.property_url, {'search': 'igloo'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+
+class LocationAutocompleteTest(APITestCase):
+    """Tests for the listing location autocomplete endpoint"""
+
+    def setUp(self):
+        """Set up listings sharing location prefixes"""
+        self.client = APIClient()
+        location_autocomplete.cache.clear()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        for title, location in [
+            ('Loft', 'San Francisco, CA'),
+            ('Studio', 'San Francisco, CA'),
+            ('Villa', 'San Diego, CA'),
+            ('Cabin', 'Santa Fe, NM'),
+            ('Flat', 'Boston, MA'),
+        ]:
+            Property.objects.create(
+                property_owner=self.host_user,
+                listing_title=title,
+                property_location=location,
+                nightly_rate=Decimal('100.00')
+            )
+        self.autocomplete_url = reverse('property-autocomplete')
+
+    def test_distinct_prefix_matches(self):
+        """Test suggestions are distinct, case-insensitive prefix matches"""
+        response = self.client.get(self.autocomplete_url, {'q': 'san'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            ['San Diego, CA', 'San Francisco, CA', 'Santa Fe, NM']
+        )
+
+    def test_limit_and_short_queries(self):
+        """Test limit is honoured and single characters return nothing"""
+        response = self.client.get(self.autocomplete_url, {'q': 'san', 'limit': 1})
+        self.assertEqual(response.data['results'], ['San Diego, CA'])
+
+        response = self.client.get(self.autocomplete_url, {'q': 's'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_prefix_candidates_are_capped(self):
+        """Test a short prefix de-duplicates a bounded number of matching rows"""
+        with patch('listings.search.AUTOCOMPLETE_PREFIX_CANDIDATES', 2), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.autocomplete_url, {'q': 'sa'})
+
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+        self.assertLessEqual(len(response.data['results']), 2)
+        self.assertTrue(all(location.startswith('San') for location in response.data['results']))
+
+    def test_hot_prefix_served_from_process_cache(self):
+        """Test repeated prefixes skip the database"""
+        self.client.get(self.autocomplete_url, {'q': 'Bos'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.autocomplete_url, {'q': 'bos'})
+        self.assertEqual(response.data['results'], ['Boston, MA'])
+
+    def test_prefix_cache_evicts_least_recently_used(self):
+        """Test the LRU keeps the most recently used entries"""
+        cache = PrefixLRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Tests for cursor pagination on listing endpoints"""
+
+    def setUp(self):
+        """Set up listings that share a listed_on timestamp"""
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        for i in range(5):
+            Property.objects.create(
+                property_owner=self.host_user,
+                listing_title=f'Listing {i}',
+                property_location='Test Location',
+                nightly_rate=Decimal('100.00')
+            )
+        # Identical sort keys force the id tiebreaker to keep pages stable.
+        Property.objects.update(listed_on=Property.objects.first().listed_on)
+        self.expected_ids = list(Property.objects.order_by('-listed_on', '-id').values_list('id', flat=True))
+        self.property_url = reverse('property-list')
+
+    def test_walk_forward_and_back(self):
+        """Test next/previous cursors visit every listing exactly once"""
+        response = self.client.get(self.property_url, {'page_size': 2})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        seen = [listing['id'] for listing in response.data['results']]
+        pages = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.extend(listing['id'] for listing in response.data['results'])
+            pages.append(response)
+        self.assertEqual(seen, self.expected_ids)
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(pages[-1].data['previous'])
+        self.assertEqual(
+            [listing['id'] for listing in response.data['results']],
+            self.expected_ids[2:4]
+        )
+
+    def test_deep_page_has_no_count_query(self):
+        """Test a cursor page costs the same queries as the first page"""
+        response = self.client.get(self.property_url, {'page_size': 2})
+        with self.assertNumQueries(2):
+            self.client.get(response.data['next'])
+
+    def test_page_number_fallback(self):
+        """Test ?page= still returns numbered pages with a count"""
+        response = self.client.get(self.property_url, {'page': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+
+    def test_page_number_count_is_exact_for_small_results(self):
+        """Test numbered pages flag exact counts below the threshold"""
+        response = self.client.get(self.property_url, {'page': 1})
+
+        self.assertFalse(response.data['count_is_approximate'])
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=1000)
+    def test_page_number_count_uses_planner_estimate(self):
+        """Test large result sets report the planner estimate instead of COUNT(*)"""
+        with patch('listings.pagination.estimate_row_count', return_value=250000):
+            with self.assertNumQueries(2):
+                response = self.client.get(self.property_url, {'page': 1})
+
+        self.assertEqual(response.data['count'], 250000)
+        self.assertTrue(response.data['count_is_approximate'])
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_keyset_indexes_serve_cursor_pages(self):
+        """Test migration 0009 lets a reservation page skip the sort"""
+        migration = import_module('listings.migrations.0009_keyset_pagination_indexes')
+        with connection.cursor() as cursor:
+            migration.add_keyset_indexes(apps, SimpleNamespace(execute=cursor.execute))
+            sql, params = Booking.objects.order_by('-booked_on', '-pk')[:21].query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+
+        self.assertIn('reservation_booked_keyset_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get(self.property_url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TaggedCacheTest(TestCase):
+    """Tests for tag-versioned response caching"""
+
+    def setUp(self):
+        """Set up a cached view backed by a local memory cache"""
+        self.cache_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        })
+        self.cache_override.enable()
+        self.addCleanup(self.cache_override.disable)
+        cache.clear()
+        hot_cache.clear()
+
+        self.calls = 0
+
+        @cache_response(ttl_key='property_detail', tags=lambda request, pk: [property_tag(pk)])
+        def detail_view(request, pk):
+            self.calls += 1
+            return Response({'id': pk, 'calls': self.calls})
+
+        self.view = detail_view
+        self.factory = APIRequestFactory()
+
+    def get(self, pk):
+        return self.view(self.factory.get(f'/api/properties/{pk}/'), pk=pk)
+
+    def test_repeat_request_is_served_from_cache(self):
+        """Test the second request returns the cached payload"""
+        first = self.get(1)
+        second = self.get(1)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+
+    def test_invalidating_tag_only_drops_its_entries(self):
+        """Test bumping property:1 leaves property:2 cached"""
+        self.get(1)
+        self.get(2)
+
+        invalidate_tags(property_tag(1))
+        self.get(1)
+        self.get(2)
+
+        self.assertEqual(self.calls, 3)
+
+    def test_evicted_generation_counter_invalidates(self):
+        """Test a lost generation counter never resurrects stale entries"""
+        self.get(1)
+        cache.delete(tag_version_key(property_tag(1)))
+        hot_cache.clear()
+        self.get(1)
+
+        self.assertEqual(self.calls, 2)
+
+
+class CacheStampedeTest(TestCase):
+    """Tests for stampede protection in cache_response"""
+
+    def setUp(self):
+        """Set up a slow cached view backed by a local memory cache"""
+        self.cache_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        })
+        self.cache_override.enable()
+        self.addCleanup(self.cache_override.disable)
+        cache.clear()
+        hot_cache.clear()
+
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+        @cache_response(ttl_key='properties', tags=['listings'])
+        def slow_view(request):
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(0.2)
+            return Response({'calls': self.calls})
+
+        self.view = slow_view
+        self.factory = APIRequestFactory()
+
+    def fire(self, workers):
+        """Send simultaneous requests and collect their response payloads"""
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(self.view(self.factory.get('/api/properties/')).data)
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_recompute_once(self):
+        """Test simultaneous cold misses run the view a single time"""
+        results = self.fire(20)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'calls': 1}] * 20)
+
+    def test_expired_entry_is_served_stale_during_rebuild(self):
+        """Test only one worker rebuilds an expired entry while others get the old value"""
+        self.view(self.factory.get('/api/properties/'))
+        with patch('listings.caching.time.time', return_value=time.time() + CACHE_TTL['properties'] + 1):
+            results = self.fire(10)
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(results.count({'calls': 1}), 9)
+
+    def test_xfetch_recomputes_before_expiry(self):
+        """Test an entry close to expiry is refreshed early by a single reader"""
+        cache.set('stampede-test', {'value': 'old', 'delta': 1.0, 'expires_at': time.time() + 0.5})
+
+        with patch('listings.caching.random.random', return_value=0.5):
+            value = get_or_recompute('stampede-test', lambda: 'new', ttl=60)
+
+        self.assertEqual(value, 'new')
+        self.assertEqual(get_or_recompute('stampede-test', lambda: 'newer', ttl=60), 'new')
+
+
+class TwoTierCacheTest(TestCase):
+    """Tests for the in-process L1 in front of the shared cache"""
+
+    def setUp(self):
+        """Set up an isolated two-tier cache"""
+        self.cache_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        })
+        self.cache_override.enable()
+        self.addCleanup(self.cache_override.disable)
+        cache.clear()
+        self.tiers = TwoTierCache(maxsize=10, ttl=60)
+
+    def test_repeat_read_is_an_l1_hit(self):
+        """Test the second read is served in-process and counted per tier"""
+        cache.set('hot-key', 'value')
+
+        self.assertEqual(self.tiers.get('hot-key'), 'value')
+        self.assertEqual(self.tiers.get('hot-key'), 'value')
+        self.assertIsNone(self.tiers.get('cold-key'))
+
+        stats = self.tiers.stats()
+        self.assertEqual(stats['l1']['hits'], 1)
+        self.assertEqual(stats['l1']['misses'], 2)
+        self.assertEqual(stats['l2']['hit_ratio'], 0.5)
+
+    def test_invalidation_message_from_another_worker_drops_l1_copy(self):
+        """Test a published invalidation makes the next read go to Redis"""
+        self.tiers.set('hot-key', 'old', 60)
+        cache.set('hot-key', 'new')
+
+        self.tiers._handle_message(json.dumps({'origin': 'other-worker', 'keys': ['hot-key']}))
+
+        self.assertEqual(self.tiers.get('hot-key'), 'new')
+
+    def test_own_invalidation_messages_are_ignored(self):
+        """Test a worker keeps the L1 copy it just wrote"""
+        self.tiers.set('hot-key', 'value', 60)
+
+        self.tiers._handle_message(json.dumps({'origin': self.tiers.origin, 'keys': ['hot-key']}))
+
+        self.assertEqual(len(self.tiers.local), 1)
+
+
+class ListingCacheInvalidationTest(APITestCase):
+    """Tests for model-signal invalidation of cached listing and review pages"""
+
+    def setUp(self):
+        """Set up a listing with a review"""
+        cache.clear()
+        hot_cache.clear()
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        self.guest_user = User.objects.create_user(username='guest', password='testpass123')
+        self.property = Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Cached Loft',
+            property_location='Test Location',
+            nightly_rate=Decimal('100.00')
+        )
+        self.detail_url = reverse('property-detail', kwargs={'pk': self.property.pk})
+
+    def test_cached_detail_is_served_without_queries(self):
+        """Test a repeated detail request does not touch the database"""
+        self.client.get(self.detail_url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['listing_title'], 'Cached Loft')
+
+    def test_cached_list_is_served_as_precompressed_bytes(self):
+        """Test a hit returns the stored gzip variant without re-rendering"""
+        for i in range(10):
+            Property.objects.create(
+                property_owner=self.host_user,
+                listing_title=f'Listing {i}',
+                property_location='Test Location',
+                nightly_rate=Decimal('100.00')
+            )
+        first = self.client.get(reverse('property-list'))
+
+        with patch('rest_framework.renderers.JSONRenderer.render') as render:
+            response = self.client.get(reverse('property-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        render.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), first.json())
+
+    def test_renderer_options_are_cached_separately(self):
+        """Test an indented JSON request is not answered with compact bytes"""
+        self.client.get(self.detail_url)
+
+        response = self.client.get(self.detail_url, HTTP_ACCEPT='application/json; indent=4')
+        response = self.client.get(self.detail_url, HTTP_ACCEPT='application/json; indent=4')
+        self.assertIn(b'\n    ', response.content)
+
+    def test_orm_write_expires_cached_detail_and_list(self):
+        """Test a save outside the API is visible on the next request"""
+        self.client.get(self.detail_url)
+        self.client.get(reverse('property-list'))
+
+        self.property.listing_title = 'Renamed Loft'
+        self.property.save()
+
+        self.assertEqual(self.client.get(self.detail_url).data['listing_title'], 'Renamed Loft')
+        response = self.client.get(reverse('property-list'))
+        self.assertEqual(response.data['results'][0]['listing_title'], 'Renamed Loft')
+
+    def test_review_expires_listing_aggregates(self):
+        """Test a new review refreshes the cached listing rating"""
+        self.client.get(self.detail_url)
+
+        Review.objects.create(reviewer=self.guest_user, reviewed_property=self.property, rating_score=4)
+
+        self.assertEqual(self.client.get(self.detail_url).data['feedback_total'], 1)
+
+    def test_username_change_expires_embedded_usernames(self):
+        """Test renaming a user refreshes cached owner and reviewer usernames"""
+        Review.objects.create(reviewer=self.guest_user, reviewed_property=self.property, rating_score=4)
+        reviews_url = reverse('review-list')
+        self.client.get(self.detail_url)
+        self.client.get(reviews_url, {'property': self.property.pk})
+
+        self.host_user.username = 'renamed_host'
+        self.host_user.save()
+        self.guest_user.username = 'renamed_guest'
+        self.guest_user.save()
+
+        self.assertEqual(self.client.get(self.detail_url).data['owner_username'], 'renamed_host')
+        response = self.client.get(reviews_url, {'property': self.property.pk})
+        self.assertEqual(response.data['results'][0]['reviewer_username'], 'renamed_guest')
+
+    def test_invalidation_repeats_on_commit(self):
+        """Test tags are bumped again once the writing transaction commits"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.property.save()
+        self.client.get(self.detail_url)
+
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(2):
+            self.client.get(self.detail_url)
+
+
+class ConditionalGetTest(APITestCase):
+    """Tests for ETag / Last-Modified revalidation"""
+
+    def setUp(self):
+        """Set up a listing with a photo"""
+        cache.clear()
+        hot_cache.clear()
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        self.guest_user = User.objects.create_user(username='guest', password='testpass123')
+        self.property = Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Validated Loft',
+            property_location='Test Location',
+            nightly_rate=Decimal('100.00')
+        )
+        PropertyImage.objects.create(listing=self.property, photo='listing_photos/loft.jpg')
+        self.detail_url = reverse('property-detail', kwargs={'pk': self.property.pk})
+
+    def test_matching_etag_returns_304_without_queries(self):
+        """Test revalidating an unchanged listing costs no database work"""
+        etag = self.client.get(self.detail_url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_returns_304(self):
+        """Test Last-Modified revalidation on the listing list"""
+        last_modified = self.client.get(reverse('property-list'))['Last-Modified']
+
+        response = self.client.get(reverse('property-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_review_changes_listing_etag(self):
+        """Test a new review (rating aggregates) invalidates the listing ETag"""
+        etag = self.client.get(self.detail_url)['ETag']
+
+        Review.objects.create(reviewer=self.guest_user, reviewed_property=self.property, rating_score=5)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_photo_list_revalidates_until_a_photo_changes(self):
+        """Test photo list ETags follow that listing's photos"""
+        photos_url = reverse('propertyimage-list')
+        params = {'listing': self.property.pk}
+        etag = self.client.get(photos_url, params)['ETag']
+        self.assertEqual(
+            self.client.get(photos_url, params, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+        PropertyImage.objects.create(listing=self.property, photo='listing_photos/loft-2.jpg')
+
+        self.assertEqual(
+            self.client.get(photos_url, params, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_new_primary_photo_demotes_the_old_one(self):
+        """Test photo changes keep one primary photo and still bust the listing cache"""
+        etag = self.client.get(self.detail_url)['ETag']
+
+        PropertyImage.objects.create(listing=self.property, photo='listing_photos/new.jpg', set_as_primary=True)
+
+        self.assertEqual(PropertyImage._meta.db_table, 'listing_photos')
+        self.assertEqual(self.property.images.filter(set_as_primary=True).count(), 1)
+        self.assertEqual(self.property.images.first().photo.name, 'listing_photos/new.jpg')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_review_list_etag_differs_per_filter(self):
+        """Test each review page representation has its own ETag"""
+        reviews_url = reverse('review-list')
+        etag = self.client.get(reviews_url)['ETag']
+
+        response = self.client.get(reviews_url, {'property': self.property.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CacheWarmingTest(APITestCase):
+    """Tests for the scheduled cache warmers"""
+
+    def setUp(self):
+        """Set up listings with different popularity signals"""
+        cache.clear()
+        hot_cache.clear()
+        self.client = APIClient()
+        self.host_user = User.objects.create_user(username='host', password='testpass123')
+        self.guest_user = User.objects.create_user(username='guest', password='testpass123')
+        self.quiet, self.saved, self.booked = [
+            Property.objects.create(
+                property_owner=self.host_user,
+                listing_title=title,
+                property_location='Test Location',
+                nightly_rate=Decimal('100.00')
+            )
+            for title in ('Quiet Cabin', 'Saved Studio', 'Booked Villa')
+        ]
+        collection = Wishlist.objects.create(owner=self.guest_user, list_name='Favourites')
+        collection.saved_properties.add(self.saved)
+        Booking.objects.create(
+            guest=self.guest_user,
+            reserved_property=self.booked,
+            arrival_date=date.today() + timedelta(days=10),
+            departure_date=date.today() + timedelta(days=12)
+        )
+
+    def test_popularity_prefers_recent_bookings_then_saves(self):
+        """Test listings rank by bookings, then wishlist saves, then recency"""
+        ranked = list(Property.objects.by_popularity().values_list('listing_title', flat=True))
+
+        self.assertEqual(ranked, ['Booked Villa', 'Saved Studio', 'Quiet Cabin'])
+
+    @override_settings(CACHE_WARMING_HOST='testserver')
+    def test_warmed_detail_pages_are_served_from_cache(self):
+        """Test warming fills the exact keys the detail endpoint reads"""
+        self.assertEqual(warm_popular_listings(), 'Warmed 3 listing detail pages')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('property-detail', kwargs={'pk': self.booked.pk}))
+        self.assertEqual(response.json()['listing_title'], 'Booked Villa')
+
+    def test_featured_endpoint_serves_warmed_listings(self):
+        """Test the featured listings come from the warmed homepage entry"""
+        warm_homepage()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('property-featured'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['listing_title'], 'Booked Villa')
+
+
 class BookingCRUDTest(APITestCase):
     """Tests for Booking CRUD operations"""
 
@@ -404,6 +1221,25 @@ class BookingCRUDTest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_booking_overlapping_dates(self):
+        """Test booking nights already held by another reservation"""
+        Booking.objects.create(
+            guest=self.guest_user,
+            reserved_property=self.property,
+            arrival_date=date.today() + timedelta(days=5),
+            departure_date=date.today() + timedelta(days=10)
+        )
+        data = {
+            'reserved_property': self.property.id,
+            'arrival_date': (date.today() + timedelta(days=8)).isoformat(),
+            'departure_date': (date.today() + timedelta(days=12)).isoformat(),
+        }
+        
+        response = self.client.post(self.booking_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('arrival_date', response.data)
+
     def test_create_booking_past_date(self):
         """Test booking with past dates"""
         data = {
@@ -644,3 +1480,671 @@ class AuthenticationTest(APITestCase):
         response = client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RateLimitMiddlewareTest(TestCase):
+    """Tests for the sliding-window rate limit middleware"""
+
+    def setUp(self):
+        """Set up the middleware in front of a trivial view"""
+        self.cache_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        })
+        self.cache_override.enable()
+        self.addCleanup(self.cache_override.disable)
+        cache.clear()
+        bucket_patch = patch.object(throttle_engine, 'buckets', LocalTokenBucket())
+        bucket_patch.start()
+        self.addCleanup(bucket_patch.stop)
+        self.middleware = RateLimitMiddleware(lambda request: JsonResponse({'ok': True}))
+        self.factory = RequestFactory()
+
+    def request(self, path):
+        request = self.factory.get(path)
+        request.user = AnonymousUser()
+        view = lambda request: JsonResponse({'ok': True})
+        return self.middleware.process_view(request, view, (), {}) or self.middleware(request)
+
+    def test_limit_is_enforced_with_retry_after(self):
+        """Test the eleventh login attempt in an hour is rejected"""
+        statuses = [self.request('/api/token/').status_code for _ in range(11)]
+
+        self.assertEqual(statuses, [200] * 10 + [429])
+        self.assertGreater(int(self.request('/api/token/')['Retry-After']), 0)
+
+    def test_rules_have_separate_counters(self):
+        """Test exhausting one endpoint's limit leaves others untouched"""
+        for _ in range(5):
+            self.request('/api/register/')
+
+        self.assertEqual(self.request('/api/register/').status_code, 429)
+        self.assertEqual(self.request('/api/listings/').status_code, 200)
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        """Test half of the previous hour still counts halfway into the next"""
+        window_start = (time.time() // RATE_LIMIT_WINDOW) * RATE_LIMIT_WINDOW
+        with patch('listings.rate_limiting.time.time', return_value=window_start + 10):
+            for _ in range(5):
+                self.request('/api/register/')
+        with patch('listings.rate_limiting.time.time', return_value=window_start + RATE_LIMIT_WINDOW * 1.5):
+            statuses = [self.request('/api/register/').status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_retry_after_waits_for_previous_window_to_decay(self):
+        """Test the wait is when the weighted count leaves room for one request"""
+        # 4 of 5 requests from the previous window still weigh 4 * 0.75 = 3.
+        wait = SlidingWindowLimiter.retry_after(previous=4, current=2, limit=5, window=100, into=25)
+
+        self.assertEqual(wait, 25)
+
+    def test_requests_without_a_view_are_counted(self):
+        """Test 404s that never reach process_view still use up the limit"""
+        middleware = RateLimitMiddleware(lambda request: JsonResponse({}, status=404))
+        statuses = []
+        for _ in range(11):
+            request = self.factory.get('/api/token/')
+            request.user = AnonymousUser()
+            statuses.append(middleware(request).status_code)
+
+        self.assertEqual(statuses, [404] * 10 + [429])
+
+    def test_blocked_client_is_rejected_without_asking_redis(self):
+        """Test requests after a refusal are shed locally until Retry-After"""
+        for _ in range(11):
+            self.request('/api/token/')
+
+        with patch.object(SlidingWindowLimiter, 'hit_many') as hit_many:
+            statuses = [self.request('/api/token/').status_code for _ in range(50)]
+
+        self.assertEqual(statuses, [429] * 50)
+        hit_many.assert_not_called()
+
+    def test_high_limits_lease_tokens_in_batches(self):
+        """Test a busy client's leases double up to a tenth of a 1000/hour limit"""
+        limiter = SlidingWindowLimiter()
+        buckets = LocalTokenBucket(limiter)
+        with patch.object(limiter, 'hit_many', wraps=limiter.hit_many) as hit_many:
+            results = [buckets.take('rate_limit:test:api', 1000) for _ in range(35)]
+
+        self.assertEqual(results, [(True, 0)] * 35)
+        self.assertEqual([call.args[0][0][3] for call in hit_many.call_args_list], [1, 2, 4, 8, 10, 10])
+
+    def test_expired_lease_refunds_unspent_tokens(self):
+        """Test a slow client is only charged for the requests it made"""
+        key = 'rate_limit:test:slow'
+        buckets = LocalTokenBucket()
+        for _ in range(2):
+            buckets.take(key, 1000)
+        state = buckets._states.get(key)
+        self.assertEqual((state['tokens'], state['lease_size']), (1, 2))
+
+        state['lease_expires'] = 0.0
+        buckets.take(key, 1000)
+
+        index = int(time.time() // RATE_LIMIT_WINDOW)
+        self.assertEqual(cache.get(f'{key}:{index}'), 3)
+        self.assertEqual(buckets._states.get(key)['lease_size'], 1)
+
+    def test_partial_lease_is_granted_near_the_limit(self):
+        """Test a lease larger than the remaining budget is cut down to fit"""
+        limiter = SlidingWindowLimiter()
+        limiter._get_script = lambda: None
+
+        self.assertEqual(limiter.hit('rate_limit:test:lease', 15, cost=10), (10, 0))
+        self.assertEqual(limiter.hit('rate_limit:test:lease', 15, cost=10), (5, 0))
+        self.assertEqual(limiter.hit('rate_limit:test:lease', 15, cost=10)[0], 0)
+
+    def test_rules_are_all_or_nothing(self):
+        """Test a rejected rule leaves the other rules of the request uncounted"""
+        limiter = SlidingWindowLimiter()
+        limiter._get_script = lambda: None
+        limiter.hit('rate_limit:test:tight', 1)
+
+        results = limiter.hit_many([
+            ('rate_limit:test:loose', 100, RATE_LIMIT_WINDOW, 1),
+            ('rate_limit:test:tight', 1, RATE_LIMIT_WINDOW, 1),
+        ])
+
+        self.assertEqual(results[0], (0, 0))
+        self.assertEqual(results[1][0], 0)
+        self.assertGreater(results[1][1], 0)
+        self.assertEqual(limiter.hit('rate_limit:test:loose', 1), (1, 0))
+
+
+class UnifiedThrottleTest(TestCase):
+    """Tests for DRF throttles sharing the middleware's throttle engine"""
+
+    class ThreePerHourThrottle(CustomAnonRateThrottle):
+        rate = '3/hour'
+
+    class ThrottledView(APIView):
+        permission_classes = [AllowAny]
+
+        def get(self, request):
+            return Response({'ok': True})
+
+    def setUp(self):
+        """Set up a DRF view throttled by the engine behind the middleware"""
+        self.cache_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        })
+        self.cache_override.enable()
+        self.addCleanup(self.cache_override.disable)
+        cache.clear()
+        bucket_patch = patch.object(throttle_engine, 'buckets', LocalTokenBucket())
+        bucket_patch.start()
+        self.addCleanup(bucket_patch.stop)
+        self.view = self.ThrottledView.as_view(throttle_classes=[self.ThreePerHourThrottle, CustomUserRateThrottle])
+        self.middleware = RateLimitMiddleware(self.view)
+        self.factory = RequestFactory()
+
+    def request(self):
+        request = self.factory.get('/api/listings/', REMOTE_ADDR='10.0.0.1')
+        request.user = AnonymousUser()
+        return self.middleware.process_view(request, self.view, (), {}) or self.middleware(request)
+
+    def test_endpoint_and_drf_rules_share_one_limiter_call(self):
+        """Test the endpoint rule and the anon rate are checked in one call"""
+        with patch.object(SlidingWindowLimiter, 'hit_many', autospec=True,
+                          side_effect=SlidingWindowLimiter.hit_many) as hit_many:
+            response = self.request()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hit_many.call_count, 1)
+        keys = [key for key, *_ in hit_many.call_args.args[1]]
+        self.assertEqual(keys, ['rate_limit:ip_10.0.0.1:api', 'rate_limit_anon_10.0.0.1'])
+
+    def test_drf_rate_is_enforced_with_retry_after(self):
+        """Test the view's throttle rate rejects the fourth request"""
+        statuses = [self.request().status_code for _ in range(4)]
+
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertGreater(int(self.request()['Retry-After']), 0)
+
+    def test_middleware_does_not_count_throttled_views_twice(self):
+        """Test the middleware leaves views with engine throttles alone"""
+        request = self.factory.get('/api/listings/')
+        request.user = AnonymousUser()
+
+        self.assertTrue(RateLimitMiddleware.throttled_by_view(self.view))
+        self.assertIsNone(self.middleware.process_view(request, self.view, (), {}))
+        self.assertFalse(hasattr(request, '_throttle_wait'))
+
+
+class RateLimitRuleTest(TestCase):
+    """Tests for compiled per-endpoint rate limit rules"""
+
+    def setUp(self):
+        """Set up a request factory"""
+        self.factory = RequestFactory()
+
+    def rate_limit(self, path, method='get', user=None, resolved=False):
+        request = getattr(self.factory, method)(path)
+        request.user = user or AnonymousUser()
+        if resolved:
+            request.resolver_match = resolve(path)
+        return throttle_engine.get_rate_limit(request)
+
+    def test_prefixes_match_whole_path_segments(self):
+        """Test a rule covers its subpaths but not paths that merely contain it"""
+        self.assertEqual(self.rate_limit('/api/reservations/7/'), ('/api/reservations/', 50))
+        self.assertEqual(self.rate_limit('/api/v2/reservations/'), ('api', 1000))
+        self.assertEqual(self.rate_limit('/api/reservations-export/'), ('api', 1000))
+        self.assertEqual(self.rate_limit('/admin/'), ('default', 100))
+
+    def test_write_heavy_routes_get_their_limits(self):
+        """Test the reservation and review limits apply to the real routes"""
+        reservation_url = reverse('booking-detail', kwargs={'pk': 7})
+        review_url = reverse('review-list')
+
+        self.assertEqual(self.rate_limit(reservation_url, resolved=True), ('/api/reservations/', 50))
+        self.assertEqual(self.rate_limit(review_url, 'post', resolved=True), ('/api/feedback/', 50))
+
+    def test_longest_prefix_wins(self):
+        """Test a nested rule overrides its parent"""
+        matcher = RouteMatcher({'/': 1, '/api/': 2, '/api/listings/': 3})
+
+        self.assertEqual(matcher.match('/api/listings/5/photos/').limit, 3)
+        self.assertEqual(matcher.match('/api/photos/').limit, 2)
+        self.assertEqual(matcher.match('/').limit, 1)
+
+    @override_settings(RATE_LIMIT_RULES={'/api/listings/': {'limit': 300, 'methods': {'post': 20}}})
+    def test_method_limits_have_their_own_counter(self):
+        """Test a per-method limit applies under a method-specific scope"""
+        self.assertEqual(self.rate_limit('/api/listings/'), ('/api/listings/', 300))
+        self.assertEqual(self.rate_limit('/api/listings/', 'post'), ('/api/listings/:POST', 20))
+
+    @override_settings(RATE_LIMIT_RULES={'/api/listings/': {'limit': 300, 'roles': {'host': 2000}}})
+    def test_role_overrides_limit(self):
+        """Test a host gets the role limit and an anonymous client the default"""
+        host = User.objects.create_user(username='ratehost', password='pass123')
+        UserProfile.objects.filter(user=host).update(user_role='host')
+        host.refresh_from_db()
+
+        self.assertEqual(self.rate_limit('/api/listings/', user=host), ('/api/listings/', 2000))
+        self.assertEqual(self.rate_limit('/api/listings/'), ('/api/listings/', 300))
+
+    @override_settings(RATE_LIMIT_RULES={'property-detail': {'limit': 7, 'scope': 'property-detail'}})
+    def test_url_name_rules_match_resolved_routes(self):
+        """Test a URL name rule applies to every path of that route"""
+        self.assertEqual(self.rate_limit('/api/listings/42/', resolved=True), ('property-detail', 7))
+        self.assertEqual(self.rate_limit('/api/listings/', resolved=True), ('api', 1000))
+
+
+class PerformanceMonitoringTest(APITestCase):
+    """Tests for request timing headers and latency histograms"""
+
+    def setUp(self):
+        """Set up a listing"""
+        host = User.objects.create_user(username='timinghost', password='pass123')
+        self.property = Property.objects.create(
+            property_owner=host,
+            listing_title='Timed Flat',
+            property_location='Lisbon',
+            nightly_rate=Decimal('80.00')
+        )
+        cache.clear()
+
+    def test_queries_are_counted_without_debug(self):
+        """Test X-DB-Queries reflects real SQL with DEBUG off"""
+        with override_settings(DEBUG=False):
+            response = self.client.get(f'/api/listings/{self.property.pk}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+    def test_server_timing_header(self):
+        """Test Server-Timing reports db, cache, serialize and total"""
+        response = self.client.get(f'/api/listings/{self.property.pk}/')
+
+        metrics = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(metrics, ['db', 'cache', 'serialize', 'total'])
+        durations = dict(
+            (entry.split(';')[0], float(entry.split('dur=')[1].split(';')[0]))
+            for entry in response['Server-Timing'].split(', ')
+        )
+        self.assertGreater(durations['cache'], 0)
+        self.assertGreater(durations['serialize'], 0)
+        self.assertGreaterEqual(durations['total'], durations['db'])
+
+    def test_latency_is_recorded_per_route(self):
+        """Test each request lands in its route's latency histogram"""
+        labels = {'method': 'GET', 'route': 'property-detail'}
+        before = metrics_registry.get_sample_value('airbnb_http_request_duration_seconds_count', labels) or 0
+
+        self.client.get(f'/api/listings/{self.property.pk}/')
+        self.client.get(f'/api/listings/{self.property.pk}/')
+
+        after = metrics_registry.get_sample_value('airbnb_http_request_duration_seconds_count', labels)
+        self.assertEqual(after - before, 2)
+
+    def test_metrics_endpoint_uses_exposition_format(self):
+        """Test /metrics/ renders request, cache and business metrics as Prometheus text"""
+        reconcile_business_metrics()
+        self.client.get(f'/api/listings/{self.property.pk}/')
+
+        response = self.client.get('/metrics/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version='))
+        body = response.content.decode()
+        self.assertIn('# TYPE airbnb_http_request_duration_seconds histogram', body)
+        self.assertIn('airbnb_http_requests_total{method="GET",route="property-detail",status="200"}', body)
+        self.assertIn('airbnb_cache_requests_total{result="miss",tier="l1"}', body)
+        self.assertIn('airbnb_properties_total 1.0', body)
+
+    def test_nested_timed_blocks_count_once(self):
+        """Test a timed call inside another of the same metric is not double counted"""
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with timed('cache'):
+                with timed('cache'):
+                    time.sleep(0.01)
+        finally:
+            current_timings.reset(token)
+
+        self.assertLess(timings.durations['cache'], 0.02)
+
+
+class BusinessMetricsTest(TestCase):
+    """Tests for the signal-maintained business gauges on /metrics/"""
+
+    def setUp(self):
+        """Set up a listing and reconciled gauges"""
+        cache.clear()
+        self.host_user = User.objects.create_user(username='gaugehost', password='pass123')
+        self.guest_user = User.objects.create_user(username='gaugeguest', password='pass123')
+        self.property = Property.objects.create(
+            property_owner=self.host_user,
+            listing_title='Counted Cabin',
+            property_location='Porto',
+            nightly_rate=Decimal('90.00')
+        )
+        reconcile_business_metrics()
+
+    def test_scrape_runs_no_queries(self):
+        """Test collecting the business gauges reads only the cache"""
+        with self.assertNumQueries(0):
+            body = render_metrics()[0].decode()
+
+        self.assertIn('airbnb_users_total 2.0', body)
+        self.assertIn('airbnb_properties_total 1.0', body)
+
+    def test_signals_keep_gauges_in_step(self):
+        """Test creating and approving a booking moves the gauges without a reconcile"""
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                guest=self.guest_user,
+                reserved_property=self.property,
+                arrival_date=date.today() + timedelta(days=10),
+                departure_date=date.today() + timedelta(days=12)
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.reservation_state = 'approved'
+            booking.save()
+
+        gauges = get_business_gauges()
+        self.assertEqual(gauges['airbnb_bookings_total'], 1)
+        self.assertEqual(gauges['airbnb_active_bookings_total'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+
+        gauges = get_business_gauges()
+        self.assertEqual(gauges['airbnb_bookings_total'], 0)
+        self.assertEqual(gauges['airbnb_active_bookings_total'], 0)
+
+    def test_missing_counters_queue_one_reconcile(self):
+        """Test a scrape after cache loss queues a reconcile instead of counting rows"""
+        cache.clear()
+
+        with patch('listings.tasks.reconcile_business_metrics.apply_async') as apply_async:
+            first = render_metrics()[0].decode()
+            render_metrics()
+
+        apply_async.assert_called_once_with(retry=False)
+        self.assertNotIn('airbnb_users_total', first)
+
+    def test_broker_outage_does_not_break_scrape(self):
+        """Test a failed reconcile publish still renders the other metrics"""
+        cache.clear()
+
+        with patch('listings.tasks.reconcile_business_metrics.apply_async', side_effect=OSError('broker down')):
+            body = render_metrics()[0].decode()
+
+        self.assertIn('django_database_connected 1.0', body)
+
+    def test_unreachable_database_reports_disconnected(self):
+        """Test the connection gauge drops to 0 when connecting fails"""
+        with patch.object(connections['default'], 'ensure_connection', side_effect=OperationalError('down')):
+            body = render_metrics()[0].decode()
+
+        self.assertIn('django_database_connected 0.0', body)
+
+
+class HealthProberTest(APITestCase):
+    """Tests for the background-probed /health/ snapshot"""
+
+    def setUp(self):
+        """Set up a prober with stub checks in place of the real dependencies"""
+        self.calls = {'database': 0, 'cache': 0}
+        self.results = {'database': {'status': 'ok'}, 'cache': {'status': 'ok'}}
+        self.prober = HealthProber(checks={name: self.make_check(name) for name in self.calls})
+        # Probe by hand; don't let the views start the background thread.
+        self.prober._pid = os.getpid()
+        patcher = patch('airbnb.health_checks.health_prober', self.prober)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_check(self, name):
+        def check():
+            self.calls[name] += 1
+            return dict(self.results[name])
+        return check
+
+    def test_requests_serve_snapshot_without_probing(self):
+        """Test /health/ and /health/ready/ return the snapshot and run no checks"""
+        self.prober.probe()
+
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                response = self.client.get('/health/')
+        ready = self.client.get('/health/ready/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'healthy')
+        self.assertIn('latency_ms', response.data['checks']['database'])
+        self.assertEqual(ready.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.calls, {'database': 1, 'cache': 1})
+
+    def test_failing_dependencies(self):
+        """Test a cache failure degrades health and a database failure fails readiness"""
+        self.results['cache'] = {'status': 'error', 'error': 'Cache miss'}
+        self.prober.probe()
+        response = self.client.get('/health/')
+        self.assertEqual(response.data['status'], 'degraded')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.results['database'] = {'status': 'error', 'error': 'down'}
+        self.prober.probe()
+        response = self.client.get('/health/ready/')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('database', response.data['message'])
+
+    @override_settings(HEALTH_PROBE_TIMEOUT=0.05)
+    def test_hung_check_times_out_and_is_not_resubmitted(self):
+        """Test a check that hangs is reported as timed out without starting another"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        hangs = []
+
+        def hung_check():
+            hangs.append(1)
+            release.wait(5)
+            return {'status': 'ok'}
+
+        self.prober.checks['cache'] = hung_check
+        first = self.prober.probe()
+        second = self.prober.probe()
+
+        self.assertEqual(len(hangs), 1)
+        self.assertEqual(self.calls['database'], 2)
+        self.assertIn('Timed out', second['checks']['cache']['error'])
+        self.assertEqual(first['status'], 'degraded')
+
+    @override_settings(REPLICA_DATABASES=['replica1'], REPLICA_MAX_LAG=2)
+    def test_lagging_replicas_do_not_fail_health(self):
+        """Test replicas too far behind warn but keep the node in rotation"""
+        replicas = ReplicaSet()
+        replicas.record_lag('replica1', 30.0)
+        with patch('airbnb.health_checks.replica_set', replicas), \
+                patch.object(replicas, 'measure', return_value={'replica1': 30.0}):
+            self.prober.checks['replicas'] = check_replicas
+            self.prober.probe()
+        response = self.client.get('/health/')
+
+        self.assertEqual(response.data['checks']['replicas']['status'], 'warning')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stale_snapshot_is_unhealthy(self):
+        """Test a snapshot the prober stopped refreshing is not reported healthy"""
+        self.prober.probe()
+        self.prober.snapshot['checked_at'] -= 3600
+
+        response = self.client.get('/health/')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertTrue(response.data['stale'])
+        self.assertEqual(self.client.get('/health/ready/').status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class ConnectionPoolTest(TestCase):
+    """Tests for the per-process database connection pool"""
+
+    def make_connection(self, transaction_status=TRANSACTION_STATUS_IDLE):
+        conn = MagicMock(closed=False)
+        conn.info.transaction_status = transaction_status
+        conn.close.side_effect = lambda: setattr(conn, 'closed', True)
+        return conn
+
+    def test_released_connection_is_reused(self):
+        """Test a released connection is handed out again without reconnecting"""
+        pool = ConnectionPool('test', max_size=2, timeout=0.1)
+        connect = MagicMock(side_effect=self.make_connection)
+
+        first = pool.acquire(connect)
+        pool.release(first)
+        second = pool.acquire(connect)
+
+        self.assertIs(first, second)
+        connect.assert_called_once_with()
+
+    def test_connection_dropped_by_server_is_replaced(self):
+        """Test a pooled connection closed server-side is swapped before checkout"""
+        pool = ConnectionPool('test', max_size=2, timeout=0.1)
+        stale = pool.acquire(self.make_connection)
+        pool.release(stale)
+        stale.cursor.side_effect = PsycopgOperationalError('server closed the connection unexpectedly')
+        fresh = self.make_connection()
+
+        conn = pool.acquire(lambda: fresh)
+
+        self.assertIs(conn, fresh)
+        self.assertTrue(stale.closed)
+        pool.release(conn)
+        self.assertEqual(pool._idle, [fresh])
+
+    def test_exhausted_pool_times_out(self):
+        """Test acquire waits for the timeout when every connection is in use"""
+        pool = ConnectionPool('test', max_size=1, timeout=0.05)
+        pool.acquire(self.make_connection)
+
+        with self.assertRaises(OperationalError):
+            pool.acquire(self.make_connection)
+
+    def test_release_resets_or_discards_connections(self):
+        """Test an open transaction is rolled back and a broken connection dropped"""
+        pool = ConnectionPool('test', max_size=2, timeout=0.1)
+        in_transaction = pool.acquire(lambda: self.make_connection(TRANSACTION_STATUS_INTRANS))
+        broken = pool.acquire(lambda: self.make_connection(TRANSACTION_STATUS_UNKNOWN))
+
+        pool.release(in_transaction)
+        pool.release(broken)
+
+        in_transaction.rollback.assert_called_once_with()
+        self.assertTrue(broken.closed)
+        self.assertEqual(pool._idle, [in_transaction])
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'], REPLICA_MAX_LAG=2)
+class ReplicaRouterTest(TestCase):
+    """Tests for routing reads to read replicas"""
+
+    def setUp(self):
+        """Set up a replica set with both replicas caught up"""
+        self.replicas = ReplicaSet()
+        self.replicas.record_lag('replica1', 0.1)
+        self.replicas.record_lag('replica2', 0.2)
+        for patcher in (
+            patch('airbnb.db_routers.replica_set', self.replicas),
+            patch('airbnb.health_checks.health_prober.start'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+
+    def test_scoped_reads_rotate_across_replicas(self):
+        """Test each replica-read scope takes the next replica and writes stay on the primary"""
+        chosen = []
+        for _ in range(4):
+            with replica_reads() as alias, patch.object(connections['default'], 'in_atomic_block', False):
+                chosen.append(self.router.db_for_read(Property))
+                self.assertEqual(chosen[-1], alias)
+                self.assertEqual(self.router.db_for_write(Property), 'default')
+
+        self.assertEqual(set(chosen), {'replica1', 'replica2'})
+        self.assertNotEqual(chosen[0], chosen[1])
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_lagging_or_unmeasured_replica_is_skipped(self):
+        """Test replicas behind REPLICA_MAX_LAG or unreachable get no reads"""
+        self.replicas.record_lag('replica2', 30)
+        self.assertEqual({self.replicas.choose() for _ in range(4)}, {'replica1'})
+
+        self.replicas.record_lag('replica1', None)
+        self.assertIsNone(self.replicas.choose())
+
+    def test_reads_in_transaction_use_primary(self):
+        """Test reads inside an atomic block stay on the primary"""
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Booking), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """Test a successful write sets the pin cookie and the user's cache marker"""
+        cache.clear()
+        user = User.objects.create_user(username='pinned', password='pass123')
+        request = RequestFactory().post('/api/listings/')
+        request.user = user
+        middleware = ReadYourWritesMiddleware(lambda request: JsonResponse({}, status=201))
+
+        response = middleware(request)
+
+        self.assertIn(PIN_COOKIE, response.cookies)
+        later = RequestFactory().get('/api/listings/')
+        later.user = user
+        self.assertTrue(pinned_to_primary(later))
+        anonymous = RequestFactory().get('/api/listings/')
+        anonymous.user = AnonymousUser()
+        self.assertFalse(pinned_to_primary(anonymous))
+
+
+@override_settings(REPLICA_DATABASES=['default'])
+class ReplicaReadViewTest(APITestCase):
+    """Tests for which listing requests read from a replica"""
+
+    def setUp(self):
+        """Set up a caught-up replica (the test database) and settled cache tags"""
+        cache.clear()
+        hot_cache.clear()
+        cache.set(tag_changed_key('listings'), time.time() - 60, None)
+        self.replicas = ReplicaSet()
+        self.replicas.record_lag('default', 0.0)
+        for patcher in (
+            patch('airbnb.db_routers.replica_set', self.replicas),
+            patch('airbnb.health_checks.health_prober.start'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.url = reverse('property-list')
+
+    def read_database(self, **extra):
+        """The replica alias the listing queryset was built under"""
+        seen = []
+        get_queryset = ListingManagementViewSet.get_queryset
+
+        def spy(view):
+            seen.append(current_replica.get())
+            return get_queryset(view)
+
+        with patch.object(ListingManagementViewSet, 'get_queryset', spy):
+            response = self.client.get(self.url, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return seen[0]
+
+    def test_list_reads_from_replica(self):
+        """Test a listing page is served from the replica"""
+        self.assertEqual(self.read_database(), 'default')
+        self.assertIsNone(current_replica.get())
+
+    def test_pinned_client_reads_primary(self):
+        """Test a client that just wrote reads from the primary"""
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertIsNone(self.read_database())
+
+    def test_recently_invalidated_tags_read_primary(self):
+        """Test a page whose tags just changed is not rebuilt from a replica"""
+        invalidate_tags('listings')
+        self.assertIsNone(self.read_database())
@@ -1,20 +1,31 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
-from datetime import date
-from .models import UserProfile, Property, PropertyImage, Booking, Payment, Review, Wishlist, Address, CustomerPreferences
+from datetime import date, timedelta
+import calendar as month_calendar
+from airbnb.db_routers import ReplicaReadMixin
+from .models import (
+	UserProfile, Property, PropertyAvailability, PropertyImage, Booking, Payment, Review, Wishlist, Address,
+	CustomerPreferences
+)
 from .serializers import (
 	ProfileDataSerializer, ListingDataSerializer, ListingPhotoSerializer,
 	ReservationDataSerializer, TransactionDataSerializer, FeedbackDataSerializer, SavedListingsSerializer,
 	LocationDataSerializer, UserPreferenceSerializer, AccountCreationSerializer, AuthenticationSerializer,
 	EmailNotificationSerializer
 )
+from .caching import (
+	CachedPropertyMixin, CachedReviewMixin, ConditionalGetMixin, get_homepage_featured, get_photos_tags
+)
+from .pagination import KeysetPagination
 from .permissions import IsOwnerOrReadOnly, IsHostOrReadOnly, IsBookingOwner
+from .search import ListingSearchFilter, NullsLastOrderingFilter, location_autocomplete, AUTOCOMPLETE_DEFAULT_LIMIT, AUTOCOMPLETE_MAX_LIMIT
 from .tasks import send_notification_email
 
 
@@ -35,20 +46,23 @@ class ProfileManagementViewSet(viewsets.ModelViewSet):
 		return Response(serializer.data)
 
 
-class ListingManagementViewSet(viewsets.ModelViewSet):
+class ListingManagementViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedPropertyMixin, viewsets.ModelViewSet):
 	queryset = Property.objects.all()
 	serializer_class = ListingDataSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly, IsHostOrReadOnly]
-	filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+	pagination_class = KeysetPagination
+	filter_backends = [DjangoFilterBackend, ListingSearchFilter, NullsLastOrderingFilter]
 	filterset_fields = ['listing_status', 'property_owner']
 	search_fields = ['listing_title', 'property_description', 'property_location']
-	ordering_fields = ['nightly_rate', 'listing_title']
+	ordering_fields = ['nightly_rate', 'listing_title', 'rating_average', 'rating_count']
+	# Unreviewed listings have no average; keep them after the rated ones.
+	nulls_last_fields = ['rating_average']
 	
 	def perform_create(self, serializer):
 		serializer.save(property_owner=self.request.user)
 	
 	def get_queryset(self):
-		queryset = Property.objects.all()
+		queryset = Property.objects.with_listing_details()
 		
 		location_query = self.request.query_params.get('location', None)
 		if location_query:
@@ -61,19 +75,106 @@ class ListingManagementViewSet(viewsets.ModelViewSet):
 		if max_rate:
 			queryset = queryset.filter(nightly_rate__lte=max_rate)
 		
+		available_from = self.request.query_params.get('available_from', None)
+		available_to = self.request.query_params.get('available_to', None)
+		if available_from or available_to:
+			start, end = self.parse_stay_window(available_from, available_to)
+			queryset = queryset.available_between(start, end)
+		
 		return queryset
 	
+	@staticmethod
+	def parse_stay_window(available_from, available_to):
+		if not (available_from and available_to):
+			raise serializers.ValidationError({
+				'available_from': 'available_from and available_to must be supplied together'
+			})
+		try:
+			start = date.fromisoformat(available_from)
+			end = date.fromisoformat(available_to)
+		except ValueError:
+			raise serializers.ValidationError({
+				'available_from': 'Dates must use the YYYY-MM-DD format'
+			})
+		if end <= start:
+			raise serializers.ValidationError({
+				'available_to': 'available_to must be later than available_from'
+			})
+		return start, end
+	
+	@action(detail=False, methods=['get'])
+	def featured(self, request):
+		"""Most popular available listings, kept warm by the warm_homepage task."""
+		return Response(get_homepage_featured())
+	
 	@action(detail=False, methods=['get'])
 	def owner_listings(self, request):
-		listings = Property.objects.filter(property_owner=request.user)
+		listings = Property.objects.with_listing_details().filter(property_owner=request.user)
 		serializer = self.get_serializer(listings, many=True)
 		return Response(serializer.data)
+	
+	@action(detail=False, methods=['get'])
+	def autocomplete(self, request):
+		"""Distinct location suggestions for ?q=, prefix matches first."""
+		query = request.query_params.get('q', '')
+		try:
+			limit = int(request.query_params.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT))
+		except ValueError:
+			return Response(
+				{'error': 'limit must be an integer'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+		
+		return Response({
+			'query': query,
+			'results': location_autocomplete.suggest(query, limit),
+		})
+	
+	@action(detail=True, methods=['get'])
+	def calendar(self, request, pk=None):
+		"""Month view of booked nights, read from the availability bitmap only."""
+		month_param = request.query_params.get('month', None)
+		try:
+			first_day = date.fromisoformat(f'{month_param}-01') if month_param else date.today().replace(day=1)
+		except ValueError:
+			return Response(
+				{'error': 'month must use the YYYY-MM format'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		
+		not_found = Response(
+			{'error': f'Property with ID {pk} does not exist'},
+			status=status.HTTP_404_NOT_FOUND
+		)
+		try:
+			listing_id = int(pk)
+		except ValueError:
+			return not_found
+		
+		availability = PropertyAvailability.objects.filter(listing_id=listing_id).first()
+		if availability is None:
+			if not Property.objects.filter(pk=listing_id).exists():
+				return not_found
+			# No reservation has ever touched this listing.
+			availability = PropertyAvailability(listing_id=listing_id, horizon_start=date.today())
+		
+		days_in_month = month_calendar.monthrange(first_day.year, first_day.month)[1]
+		nights = [first_day + timedelta(days=offset) for offset in range(days_in_month)]
+		return Response({
+			'listing': listing_id,
+			'month': first_day.strftime('%Y-%m'),
+			'horizon_start': availability.horizon_start,
+			'horizon_end': availability.horizon_end,
+			'days': [{'date': night, 'booked': availability.is_booked(night)} for night in nights],
+		})
 
 
-class PhotoManagementViewSet(viewsets.ModelViewSet):
+class PhotoManagementViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
 	queryset = PropertyImage.objects.all()
 	serializer_class = ListingPhotoSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly]
+	list_cache_tags = staticmethod(get_photos_tags)
 	
 	def get_queryset(self):
 		queryset = PropertyImage.objects.all()
@@ -87,6 +188,7 @@ class ReservationManagementViewSet(viewsets.ModelViewSet):
 	queryset = Booking.objects.all()
 	serializer_class = ReservationDataSerializer
 	permission_classes = [IsAuthenticated, IsBookingOwner]
+	pagination_class = KeysetPagination
 	filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
 	filterset_fields = ['reservation_state', 'reserved_property']
 	ordering_fields = ['arrival_date', 'departure_date']
@@ -100,7 +202,18 @@ class ReservationManagementViewSet(viewsets.ModelViewSet):
 		)
 	
 	def perform_create(self, serializer):
-		serializer.save(guest=self.request.user)
+		# Booking.save() re-checks overlaps (and the database constraint may
+		# reject a concurrent double booking); surface those as 400s.
+		try:
+			serializer.save(guest=self.request.user)
+		except DjangoValidationError as exc:
+			raise serializers.ValidationError(exc.message_dict)
+	
+	def perform_update(self, serializer):
+		try:
+			serializer.save()
+		except DjangoValidationError as exc:
+			raise serializers.ValidationError(exc.message_dict)
 	
 	@action(detail=True, methods=['post'])
 	def approve_reservation(self, request, pk=None):
@@ -111,14 +224,20 @@ class ReservationManagementViewSet(viewsets.ModelViewSet):
 				status=status.HTTP_403_FORBIDDEN
 			)
 		reservation.reservation_state = 'approved'
-		reservation.save()
+		try:
+			reservation.save(update_fields=['reservation_state', 'last_updated'])
+		except DjangoValidationError as exc:
+			raise serializers.ValidationError(exc.message_dict)
 		return Response({'status': 'reservation approved'})
 	
 	@action(detail=True, methods=['post'])
 	def cancel_reservation(self, request, pk=None):
 		reservation = self.get_object()
 		reservation.reservation_state = 'cancelled'
-		reservation.save()
+		try:
+			reservation.save(update_fields=['reservation_state', 'last_updated'])
+		except DjangoValidationError as exc:
+			raise serializers.ValidationError(exc.message_dict)
 		return Response({'status': 'reservation cancelled'})
 
 
@@ -134,10 +253,11 @@ class TransactionViewSet(viewsets.ModelViewSet):
 		return Payment.objects.filter(reservation__guest=current_user)
 
 
-class FeedbackManagementViewSet(viewsets.ModelViewSet):
+class FeedbackManagementViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedReviewMixin, viewsets.ModelViewSet):
 	queryset = Review.objects.all()
 	serializer_class = FeedbackDataSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly]
+	pagination_class = KeysetPagination
 	filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
 	filterset_fields = ['reviewed_property', 'rating_score']
 	ordering_fields = ['rating_score']